@@ -10,7 +10,7 @@ from fastapi import APIRouter, File, Form, HTTPException, UploadFile, Response
 
 from src.models import JobMetadata, JobMode, JobStatus
 from src.schemas import CreateJobResponse, ErrorResponse, JobDetailResponse, JobListItem
-from src.services import job_storage
+from src.services import job_storage, stream_analysis_runner
 from src.utils import extract_video_info, save_uploaded_file
 from src.utils.encoding import parse_yuv_name
 
@@ -244,6 +244,9 @@ async def create_bitstream_job(
     # 更新元数据
     job_storage.update_job(job)
 
+    # 输入文件已就绪，唤醒后台处理器
+    stream_analysis_runner.notify_job_submitted()
+
     return CreateJobResponse(
         job_id=metadata.job_id,
         status=metadata.status,
@@ -304,7 +304,7 @@ async def execute_template(
                 if error:
                     cmd_log.error_message = error
                 break
-        job_storage.update_job(job)
+        job_storage.update_job_debounced(job)
 
     # 添加命令日志
     def add_command_log(command_type: str, command: str, source_file: str = None) -> str:
@@ -317,7 +317,7 @@ async def execute_template(
             source_file=source_file,
         )
         job.metadata.command_logs.append(cmd_log)
-        job_storage.update_job(job)
+        job_storage.update_job_debounced(job)
         return command_id
 
     # 后台执行转码任务
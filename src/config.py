@@ -32,6 +32,9 @@ class Settings(BaseModel):
     ffmpeg_path: Optional[str] = None  # FFmpeg 目录路径，如 /usr/local/ffmpeg/bin
     ffmpeg_timeout: int
 
+    # 后台任务并发数（默认 CPU 逻辑核数 / 4，至少 1）
+    max_parallel_jobs: Optional[int] = None
+
     # 日志配置
     log_level: str
 
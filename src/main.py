@@ -20,12 +20,16 @@ from src.api import (
 )
 from src.config import settings
 from src.services import stream_analysis_runner
+from src.utils.performance import install_child_watcher
 
 
 # 应用生命周期管理
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理器"""
+    # 子进程（ffmpeg/编码器）退出通知改用 pidfd
+    install_child_watcher()
+
     # 启动时：启动后台任务处理器和调度器
     stream_task = asyncio.create_task(stream_analysis_runner.start_background_processor())
 
@@ -3,7 +3,8 @@ Schedule 数据模型
 
 用于定时执行模板任务，自动编译编码器
 """
-from datetime import datetime
+import calendar
+from datetime import datetime, timedelta, timezone
 from enum import Enum
 from pathlib import Path
 from typing import Optional, List
@@ -11,6 +12,13 @@ from typing import Optional, List
 from pydantic import BaseModel, Field, ConfigDict
 
 
+def to_utc_naive(value: datetime) -> datetime:
+    """转换为不带时区的 UTC 时间（与 datetime.utcnow() 可比较）"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
 class ScheduleRepeat(str, Enum):
     """重复周期"""
     NONE = "none"
@@ -73,6 +81,52 @@ class ScheduleMetadata(BaseModel):
         json_encoders={datetime: lambda v: v.isoformat()},
     )
 
+    def compute_next_execution(self, after: datetime) -> Optional[datetime]:
+        """
+        计算晚于 after 的下次执行时间
+
+        直接按 日/周/月 跳转到候选时间，不逐分钟遍历。
+
+        start_time 与 after 可能分别带/不带时区（前端提交的是 UTC ISO 字符串），
+        统一转换为不带时区的 UTC 时间后再比较。
+
+        Args:
+            after: 基准时间（不含）
+
+        Returns:
+            下次执行时间（不带时区的 UTC）；单次执行且已过期时返回 None
+        """
+        start = to_utc_naive(self.start_time)
+        after = to_utc_naive(after)
+        if self.repeat == ScheduleRepeat.NONE:
+            return start if start > after else None
+        if start > after:
+            return start
+
+        candidate = after.replace(hour=start.hour, minute=start.minute, second=0, microsecond=0)
+
+        if self.repeat == ScheduleRepeat.DAILY:
+            if candidate <= after:
+                candidate += timedelta(days=1)
+            return candidate
+
+        if self.repeat == ScheduleRepeat.WEEKLY:
+            candidate += timedelta(days=(start.weekday() - candidate.weekday()) % 7)
+            if candidate <= after:
+                candidate += timedelta(weeks=1)
+            return candidate
+
+        # MONTHLY：跳过天数不足的月份（如 31 号）
+        year, month = after.year, after.month
+        while True:
+            if start.day <= calendar.monthrange(year, month)[1]:
+                candidate = candidate.replace(year=year, month=month, day=start.day)
+                if candidate > after:
+                    return candidate
+            month += 1
+            if month > 12:
+                year, month = year + 1, 1
+
 
 class ScheduleExecution(BaseModel):
     """单次执行记录"""
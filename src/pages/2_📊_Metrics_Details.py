@@ -67,6 +67,7 @@ def _build_rows(data: Dict[str, Any]) -> tuple[List[Dict[str, Any]], List[Dict[s
                     "Total Time(s)": perf.get("total_encoding_time_s"),
                     "Frames": perf.get("total_frames"),
                     "cpu_samples": perf.get("cpu_samples", []),
+                    "cpu_sample_interval_ms": perf.get("cpu_sample_interval_ms", 100),
                 })
     return rows, perf_rows
 
@@ -83,6 +83,7 @@ def _build_rows(data: Dict[str, Any], side_label: str) -> tuple[List[Dict[str, A
                     "Total Time(s)": perf.get("total_encoding_time_s"),
                     "Frames": perf.get("total_frames"),
                     "cpu_samples": perf.get("cpu_samples", []),
+                    "cpu_sample_interval_ms": perf.get("cpu_sample_interval_ms", 100),
                 })
     return rows, perf_rows
 
@@ -278,8 +279,8 @@ if anchor_job and test_job:
 
     if perf_rows:
         df_perf = pd.DataFrame(perf_rows)
-        perf_detail_format = {"Point": "{:.2f}", "FPS": "{:.2f}", "CPU Avg(%)": "{:.2f}", "CPU Max(%)": "{:.2f}"}
-        render_performance_section(df_perf=df_perf, anchor_label="Anchor", test_label="Test", detail_df=df_perf.drop(columns=["cpu_samples"], errors="ignore"), detail_format=perf_detail_format, delta_point_key="perf_delta_point_analysis", delta_metric_key="perf_delta_metric_analysis", cpu_video_key="perf_video_analysis", cpu_point_key="perf_point_analysis", cpu_agg_key="cpu_agg_analysis")
+        perf_detail_format = {"Point": "%.2f", "FPS": "%.2f", "CPU Avg(%)": "%.2f", "CPU Max(%)": "%.2f"}
+        render_performance_section(df_perf=df_perf, anchor_label="Anchor", test_label="Test", detail_df=df_perf.drop(columns=["cpu_samples", "cpu_sample_interval_ms"], errors="ignore"), detail_format=perf_detail_format, delta_point_key="perf_delta_point_analysis", delta_metric_key="perf_delta_metric_analysis", cpu_video_key="perf_video_analysis", cpu_point_key="perf_point_analysis", cpu_agg_key="cpu_agg_analysis")
     else:
         st.info("暂无性能数据。请确保编码任务已完成并采集了性能数据。")
 
@@ -556,13 +557,13 @@ elif template_job_id:
                 rc, point = _parse_point(item.get("label", ""))
                 perf = item.get("performance") or {}
                 if perf:
-                    perf_rows.append({"Video": video, "Side": side_name, "Point": point, "FPS": perf.get("encoding_fps"), "CPU Avg(%)": perf.get("cpu_avg_percent"), "CPU Max(%)": perf.get("cpu_max_percent"), "cpu_samples": perf.get("cpu_samples", [])})
+                    perf_rows.append({"Video": video, "Side": side_name, "Point": point, "FPS": perf.get("encoding_fps"), "CPU Avg(%)": perf.get("cpu_avg_percent"), "CPU Max(%)": perf.get("cpu_max_percent"), "cpu_samples": perf.get("cpu_samples", []), "cpu_sample_interval_ms": perf.get("cpu_sample_interval_ms", 100)})
                     perf_detail_rows.append({"Video": video, "Side": side_name, "Point": point, "FPS": perf.get("encoding_fps"), "CPU Avg(%)": perf.get("cpu_avg_percent"), "CPU Max(%)": perf.get("cpu_max_percent"), "Total Time(s)": perf.get("total_encoding_time_s"), "Frames": perf.get("total_frames")})
 
     if perf_rows:
         df_perf = pd.DataFrame(perf_rows)
         perf_detail_df = pd.DataFrame(perf_detail_rows)
-        perf_detail_format = {"Point": "{:.2f}", "FPS": "{:.2f}", "CPU Avg(%)": "{:.2f}", "CPU Max(%)": "{:.2f}", "Total Time(s)": "{:.2f}"}
+        perf_detail_format = {"Point": "%.2f", "FPS": "%.2f", "CPU Avg(%)": "%.2f", "CPU Max(%)": "%.2f", "Total Time(s)": "%.2f"}
         render_performance_section(df_perf=df_perf, anchor_label="Anchor", test_label="Test", detail_df=perf_detail_df, detail_format=perf_detail_format, delta_point_key="perf_delta_point", delta_metric_key="perf_delta_metric", cpu_video_key="perf_video", cpu_point_key="perf_point", cpu_agg_key="cpu_agg")
     else:
         st.info("暂无性能数据。请确保编码任务已完成并采集了性能数据。")
@@ -26,6 +26,7 @@ from src.utils.streamlit_helpers import (
     list_jobs,
     get_query_param,
     load_json_report,
+    sign_color_styles,
 )
 
 
@@ -60,7 +61,7 @@ def _plot_frame_lines(
                 avg_val = sum(numeric_vals) / len(numeric_vals)
         legend_name = f"{label}: {avg_val:.4f}" if avg_val is not None else label
         color = colors[idx % len(colors)]
-        fig.add_trace(go.Scatter(x=list(range(len(values))), y=values, mode="lines", name=legend_name, line=dict(color=color)))
+        fig.add_trace(go.Scattergl(x=list(range(len(values))), y=values, mode="lines", name=legend_name, line=dict(color=color)))
     fig.update_layout(
         title=title,
         xaxis_title="Frame",
@@ -326,18 +327,8 @@ if len(df_metrics) >= 2:
     diff_df.iloc[0, 1:] = 0  # 基准行显示 0
     diff_df.columns = pd.MultiIndex.from_tuples(anchor_columns)
 
-    # 定义颜色样式函数
-    def _color_diff(val):
-        if pd.isna(val) or not isinstance(val, (int, float)):
-            return ""
-        if val > 0:
-            return "color: green"
-        elif val < 0:
-            return "color: red"
-        return ""
-
     # 应用颜色样式和格式化精度到所有数值列（除了第一列 Encoded）
-    styled_diff = diff_df.style.applymap(_color_diff, subset=diff_df.columns[1:]).format(format_dict, na_rep="-")
+    styled_diff = diff_df.style.apply(sign_color_styles, subset=diff_df.columns[1:], axis=None).format(format_dict, na_rep="-")
     st.dataframe(styled_diff, use_container_width=True, hide_index=True)
 
 # PSNR 逐帧折线图
@@ -502,10 +493,15 @@ color_map = {
     "UNK": "#6b7280",
 }
 
+# 新版报告中 frame_types 为单字符编码的字符串（每帧一个字符）
+frame_type_names = {"R": "RAW", "U": "UNK", "?": "UNK"}
+
 fig_frames = go.Figure()
 for idx, item in enumerate(encoded_items):
     bitrate = item.get("bitrate", {}) or {}
     types = bitrate.get("frame_types", []) or []
+    if isinstance(types, str):
+        types = [frame_type_names.get(t, t) for t in types]
     sizes = bitrate.get("frame_sizes", []) or []
     colors = [color_map.get(str(t), "#6b7280") for t in types]
     hover = [
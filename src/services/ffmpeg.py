@@ -336,12 +336,14 @@ class FFmpegService:
         Returns:
             List[dict]: 每帧包含 index, pict_type, pkt_size, timestamp
         """
+        # compact 输出为每帧一行 frame|key=value|...，逐行解析比整体 JSON 解析开销小得多；
+        # 保留段名前缀，以便跳过 side data 等子段输出的行
         cmd: List[str] = [
             self.ffprobe_path,
             "-v",
             "quiet",
             "-print_format",
-            "json",
+            "compact",
             "-select_streams",
             "v:0",
             "-show_frames",
@@ -362,31 +364,38 @@ class FFmpegService:
             if process.returncode != 0:
                 raise RuntimeError(f"ffprobe failed: {stderr.decode()}")
 
-            payload = json.loads(stdout.decode())
-            frames = payload.get("frames", []) or []
             results: List[Dict[str, Any]] = []
 
-            for idx, frame in enumerate(frames):
-                pkt_size = frame.get("pkt_size")
+            for line in stdout.decode().splitlines():
+                if not line.startswith("frame|"):
+                    continue
+                frame: Dict[str, str] = {}
+                for item in line.split("|")[1:]:
+                    key, sep, value = item.partition("=")
+                    if sep:
+                        frame.setdefault(key, value)
+                idx = len(results)
+
                 try:
-                    size_val = int(pkt_size) if pkt_size is not None else 0
-                except (TypeError, ValueError):
+                    size_val = int(frame.get("pkt_size", 0))
+                except ValueError:
                     size_val = 0
 
                 ts_val = frame.get("best_effort_timestamp_time")
-                if ts_val is None:
+                if ts_val is None or ts_val == "N/A":
                     ts_val = frame.get("pkt_pts_time")
 
                 timestamp: Optional[float]
                 try:
-                    timestamp = float(ts_val) if ts_val is not None else None
-                except (TypeError, ValueError):
+                    timestamp = float(ts_val) if ts_val not in (None, "N/A") else None
+                except ValueError:
                     timestamp = None
 
+                pict_type = frame.get("pict_type")
                 results.append(
                     {
                         "index": idx,
-                        "pict_type": frame.get("pict_type") or None,
+                        "pict_type": pict_type if pict_type and pict_type != "?" else None,
                         "pkt_size": size_val,
                         "timestamp": timestamp,
                     }
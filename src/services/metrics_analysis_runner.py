@@ -2,13 +2,13 @@
 Metrics 分析模板执行器（单侧）
 """
 import asyncio
-import json
 import platform
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
+import orjson
 import psutil
 
 from src.models import CommandLog, CommandStatus
@@ -168,7 +168,7 @@ class MetricsAnalysisRunner:
                         cmd_log.error_message = error
                     break
             try:
-                job_storage.update_job(job)
+                job_storage.update_job_debounced(job)
             except Exception:
                 pass
 
@@ -224,8 +224,10 @@ class MetricsAnalysisRunner:
 
         data_path = analysis_root / "metrics_analysis.json"
         try:
-            with open(data_path, "w", encoding="utf-8") as f:
-                json.dump(result, f, ensure_ascii=False)
+            # orjson 直接生成 UTF-8 bytes，cpu_samples 等大数组无需经过 Python 层编码器
+            payload = orjson.dumps(result, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+            with open(data_path, "wb") as f:
+                f.write(payload)
             if job:
                 result["data_file"] = str(data_path.relative_to(job.job_dir))
             else:
@@ -4,7 +4,6 @@
 尽量复用现有码流分析逻辑，允许破坏式实现。
 """
 import asyncio
-import json
 import platform
 import re
 import time
@@ -13,6 +12,7 @@ from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
+import orjson
 import psutil
 import numpy as np
 
@@ -137,7 +137,7 @@ async def run_template(
         )
         job.metadata.command_logs.append(log)
         try:
-            job_storage.update_job(job)
+            job_storage.update_job_debounced(job)
         except Exception:
             pass
         return log.command_id
@@ -157,7 +157,7 @@ async def run_template(
                     log.error_message = error
                 break
         try:
-            job_storage.update_job(job)
+            job_storage.update_job_debounced(job)
         except Exception:
             pass
     # 校验码控/点位一致性
@@ -398,9 +398,10 @@ async def run_template(
     report_dir.mkdir(parents=True, exist_ok=True)
     report_path = report_dir / "metrics_comparison.json"
     try:
-        with open(report_path, "w", encoding="utf-8") as f:
-            # 使用紧凑格式减小文件体积（无缩进，无多余空格）
-            json.dump(result, f, ensure_ascii=False, separators=(",", ":"))
+        # orjson 默认输出紧凑格式（无缩进，无多余空格），直接生成 UTF-8 bytes
+        payload = orjson.dumps(result, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+        with open(report_path, "wb") as f:
+            f.write(payload)
         if job:
             result["data_file"] = str(report_path.relative_to(job.job_dir))
         else:
@@ -5,6 +5,7 @@ Schedule 执行服务
 """
 import logging
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 
@@ -28,6 +29,18 @@ from src.services.schedule_storage import schedule_storage
 
 logger = logging.getLogger(__name__)
 
+# 模板类型 -> (任务模式, 执行器)
+_DISPATCH = {
+    TemplateType.METRICS_COMPARISON: (JobMode.METRICS_COMPARISON, metrics_comparison_runner),
+    TemplateType.METRICS_ANALYSIS: (JobMode.METRICS_ANALYSIS, metrics_analysis_runner),
+}
+
+
+@lru_cache(maxsize=64)
+def _load_template_cached(template_id: str, mtime_ns: int) -> Optional[EncodingTemplate]:
+    """按 (template_id, 文件修改时间) 缓存模板解析结果"""
+    return template_storage.get_template(template_id)
+
 
 class ScheduleRunner:
     """Schedule 执行器"""
@@ -124,10 +137,7 @@ class ScheduleRunner:
 
         # 计算下次执行时间
         if schedule.repeat != ScheduleRepeat.NONE and schedule.status == ScheduleStatus.ACTIVE:
-            schedule.next_execution = self._calculate_next_execution(
-                start_time,
-                schedule.repeat,
-            )
+            schedule.next_execution = schedule.compute_next_execution(after=start_time)
         else:
             schedule.next_execution = None
 
@@ -182,29 +192,27 @@ class ScheduleRunner:
         """
         logger.info(f"Loading template: {schedule.template_id}")
 
-        # 从存储加载模板
-        template = template_storage.get_template(schedule.template_id)
-        if not template:
+        # 从存储加载模板（按文件修改时间缓存解析结果，返回副本以免修改缓存）
+        metadata_path = template_storage.root_dir / schedule.template_id / "template.json"
+        try:
+            mtime_ns = metadata_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            raise ValueError(f"Template not found: {schedule.template_id}")
+        cached = _load_template_cached(schedule.template_id, mtime_ns)
+        if not cached:
             raise ValueError(f"Template not found: {schedule.template_id}")
+        template = cached.model_copy(deep=True)
 
-        # 覆盖 encoder_path（由于 extra="ignore"，可以动态添加字段）
-        # 更新 anchor 侧的 encoder_path
-        if hasattr(template.metadata.anchor, "__dict__"):
-            template.metadata.anchor.encoder_path = str(encoder_path)
-        else:
-            # Pydantic model，使用 model_copy 或直接设置
-            template.metadata.anchor = template.metadata.anchor.model_copy(
-                update={"encoder_path": str(encoder_path)}
-            )
+        # 覆盖 anchor 侧的 encoder_path
+        template.metadata.anchor = template.metadata.anchor.model_copy(
+            update={"encoder_path": str(encoder_path)}
+        )
 
         # 如果是 comparison 模式，也需要更新 test 侧
         if template.metadata.test:
-            if hasattr(template.metadata.test, "__dict__"):
-                template.metadata.test.encoder_path = str(encoder_path)
-            else:
-                template.metadata.test = template.metadata.test.model_copy(
-                    update={"encoder_path": str(encoder_path)}
-                )
+            template.metadata.test = template.metadata.test.model_copy(
+                update={"encoder_path": str(encoder_path)}
+            )
 
         # 验证模板类型
         expected_type = TemplateType(schedule.template_type)
@@ -237,12 +245,9 @@ class ScheduleRunner:
 
         # 确定任务模式
         template_type = TemplateType(schedule.template_type)
-        if template_type == TemplateType.METRICS_COMPARISON:
-            job_mode = JobMode.METRICS_COMPARISON
-        elif template_type == TemplateType.METRICS_ANALYSIS:
-            job_mode = JobMode.METRICS_ANALYSIS
-        else:
+        if template_type not in _DISPATCH:
             raise ValueError(f"Unsupported template type: {template_type}")
+        job_mode, _ = _DISPATCH[template_type]
 
         # 创建任务元数据
         metadata = JobMetadata(
@@ -281,15 +286,12 @@ class ScheduleRunner:
         try:
             # 根据模板类型选择执行器
             template_type = template.metadata.template_type
-
-            if template_type == TemplateType.METRICS_COMPARISON:
-                logger.info("Running metrics comparison")
-                result = await metrics_comparison_runner.execute(template, job=job)
-            elif template_type == TemplateType.METRICS_ANALYSIS:
-                logger.info("Running metrics analysis")
-                result = await metrics_analysis_runner.execute(template, job=job)
-            else:
+            if template_type not in _DISPATCH:
                 raise ValueError(f"Unsupported template type: {template_type}")
+            _, runner = _DISPATCH[template_type]
+
+            logger.info(f"Running {template_type.value}")
+            result = await runner.execute(template, job=job)
 
             # 更新任务状态
             job.metadata.status = JobStatus.COMPLETED
@@ -311,33 +313,6 @@ class ScheduleRunner:
 
             raise
 
-    def _calculate_next_execution(
-        self,
-        base_time: datetime,
-        repeat: ScheduleRepeat,
-    ) -> Optional[datetime]:
-        """
-        计算下次执行时间
-
-        Args:
-            base_time: 基准时间
-            repeat: 重复周期
-
-        Returns:
-            下次执行时间
-        """
-        from datetime import timedelta
-
-        if repeat == ScheduleRepeat.DAILY:
-            return base_time + timedelta(days=1)
-        elif repeat == ScheduleRepeat.WEEKLY:
-            return base_time + timedelta(weeks=1)
-        elif repeat == ScheduleRepeat.MONTHLY:
-            # 简单处理：加 30 天
-            return base_time + timedelta(days=30)
-        else:
-            return None
-
 
 # 全局单例
 schedule_runner = ScheduleRunner()
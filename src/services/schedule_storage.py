@@ -3,13 +3,21 @@ Schedule 存储服务
 
 负责 Schedule 和执行记录的持久化存储
 """
-import json
+import gzip
+import heapq
 import logging
+import os
+import shutil
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
 
+import orjson
+import yaml
 from nanoid import generate
+from pydantic import TypeAdapter
 
 from src.config import settings
 from src.models.schedule import (
@@ -20,6 +28,52 @@ from src.models.schedule import (
 
 logger = logging.getLogger(__name__)
 
+# 复用已构建的校验/序列化器
+_SCHEDULE_ADAPTER = TypeAdapter(ScheduleMetadata)
+_EXECUTION_ADAPTER = TypeAdapter(ScheduleExecution)
+_EXECUTION_LIST_ADAPTER = TypeAdapter(List[ScheduleExecution])
+
+# 缓存未命中的 Schedule 超过该数量时，使用线程池并行解析
+_PARALLEL_LOAD_THRESHOLD = 8
+_MAX_LOAD_WORKERS = 8
+
+# 执行记录保留条数；NDJSON 行数超过其 2 倍时压缩
+_EXECUTIONS_RETENTION = 100
+
+
+def _atomic_write_bytes(path: Path, data: bytes) -> None:
+    """原子写入：先写临时文件并 fsync，再 os.replace 覆盖目标文件"""
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _write_document(path: Path, data: Any) -> None:
+    """以 JSON（orjson）格式写入文档（JSON 同时也是合法的 YAML）"""
+    _atomic_write_bytes(path, orjson.dumps(data, option=orjson.OPT_INDENT_2))
+
+
+def _parse_ndjson_line(line: bytes) -> Optional[Any]:
+    """解析一行 NDJSON，忽略空行和未写完整的行"""
+    if not line.strip():
+        return None
+    try:
+        return orjson.loads(line)
+    except orjson.JSONDecodeError:
+        return None
+
+
+def _read_document(path: Path) -> Any:
+    """读取文档：优先按 JSON 解析，失败时回退到 YAML（兼容旧文件）"""
+    raw = path.read_bytes()
+    try:
+        return orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        return yaml.safe_load(raw)
+
 
 class ScheduleStorage:
     """Schedule 存储服务"""
@@ -27,152 +81,249 @@ class ScheduleStorage:
     def __init__(self):
         self.root_dir = Path(settings.schedules_root_dir)
         self.root_dir.mkdir(parents=True, exist_ok=True)
+        # schedule_id -> ((st_mtime_ns, st_size), ScheduleMetadata)
+        self._cache: Dict[str, Tuple[Tuple[int, int], ScheduleMetadata]] = {}
+        # schedule_id -> executions.ndjson 当前行数
+        self._execution_counts: Dict[str, int] = {}
 
     def generate_schedule_id(self) -> str:
         """生成 Schedule ID（12 字符）"""
         return generate(size=12)
 
     def _get_schedule_dir(self, schedule_id: str) -> Path:
-        """获取 Schedule 目录"""
-        schedule_dir = self.root_dir / schedule_id
-        schedule_dir.mkdir(parents=True, exist_ok=True)
-        return schedule_dir
+        """获取 Schedule 目录（仅在 create_schedule 中创建）"""
+        return self.root_dir / schedule_id
 
     def _get_schedule_path(self, schedule_id: str) -> Path:
         """获取 schedule.yml 路径"""
         return self._get_schedule_dir(schedule_id) / "schedule.yml"
 
     def _get_executions_path(self, schedule_id: str) -> Path:
-        """获取 executions.yml 路径"""
+        """获取 executions.ndjson 路径（每行一条执行记录，按时间顺序追加）"""
+        return self._get_schedule_dir(schedule_id) / "executions.ndjson"
+
+    def _get_legacy_executions_path(self, schedule_id: str) -> Path:
+        """获取旧版 executions.yml 路径（整体列表格式）"""
         return self._get_schedule_dir(schedule_id) / "executions.yml"
 
     def create_schedule(self, schedule: ScheduleMetadata) -> None:
         """创建 Schedule"""
         schedule_dir = self._get_schedule_dir(schedule.schedule_id)
 
-        # 创建子目录
-        (schedule_dir / "workspace").mkdir(exist_ok=True)
+        # 创建目录及子目录
+        (schedule_dir / "workspace").mkdir(parents=True, exist_ok=True)
         (schedule_dir / "logs").mkdir(exist_ok=True)
 
         # 保存 schedule.yml
         schedule_path = self._get_schedule_path(schedule.schedule_id)
-        with open(schedule_path, "w", encoding="utf-8") as f:
-            import yaml
-            yaml.dump(
-                schedule.model_dump(mode="json"),
-                f,
-                allow_unicode=True,
-                default_flow_style=False,
-            )
+        _write_document(schedule_path, _SCHEDULE_ADAPTER.dump_python(schedule, mode="json"))
 
         logger.info(f"Schedule created: {schedule.schedule_id}")
 
+    def _load_schedule(self, schedule_id: str, schedule_path: Path, stat: os.stat_result) -> Optional[ScheduleMetadata]:
+        """解析 schedule.yml 并写入缓存"""
+        try:
+            data = _read_document(schedule_path)
+            schedule = _SCHEDULE_ADAPTER.validate_python(data)
+        except Exception as e:
+            logger.error(f"Failed to load schedule {schedule_id}: {e}")
+            return None
+        self._cache[schedule_id] = ((stat.st_mtime_ns, stat.st_size), schedule)
+        return schedule
+
+    def _get_cached(self, schedule_id: str, stat: os.stat_result) -> Optional[ScheduleMetadata]:
+        """文件未变化时返回缓存对象（不可修改，对外返回前需复制）"""
+        cached = self._cache.get(schedule_id)
+        if cached and cached[0] == (stat.st_mtime_ns, stat.st_size):
+            return cached[1]
+        return None
+
     def get_schedule(self, schedule_id: str) -> Optional[ScheduleMetadata]:
         """获取 Schedule"""
         schedule_path = self._get_schedule_path(schedule_id)
-        if not schedule_path.exists():
-            return None
-
         try:
-            import yaml
-            with open(schedule_path, "r", encoding="utf-8") as f:
-                data = yaml.safe_load(f)
-            return ScheduleMetadata(**data)
-        except Exception as e:
-            logger.error(f"Failed to load schedule {schedule_id}: {e}")
+            stat = schedule_path.stat()
+        except FileNotFoundError:
+            self._cache.pop(schedule_id, None)
             return None
 
-    def list_schedules(self) -> List[ScheduleMetadata]:
-        """列出所有 Schedules"""
+        schedule = self._get_cached(schedule_id, stat) or self._load_schedule(schedule_id, schedule_path, stat)
+        # 调用方可能会修改返回的对象，返回副本
+        return schedule.model_copy(deep=True) if schedule else None
+
+    def _scan_schedules(
+        self,
+        predicate: Optional[Callable[[ScheduleMetadata], bool]] = None,
+    ) -> List[ScheduleMetadata]:
+        """扫描所有 Schedules，先在缓存对象上过滤，仅复制命中的条目"""
         schedules = []
-        for schedule_dir in self.root_dir.iterdir():
-            if not schedule_dir.is_dir():
-                continue
-            schedule = self.get_schedule(schedule_dir.name)
-            if schedule:
-                schedules.append(schedule)
+        misses: List[Tuple[str, Path, os.stat_result]] = []
+        with os.scandir(self.root_dir) as entries:
+            for entry in entries:
+                if not entry.is_dir(follow_symlinks=False):
+                    continue
+                schedule_path = Path(entry.path) / "schedule.yml"
+                try:
+                    stat = schedule_path.stat()
+                except FileNotFoundError:
+                    continue
+                cached = self._get_cached(entry.name, stat)
+                if cached:
+                    schedules.append(cached)
+                else:
+                    misses.append((entry.name, schedule_path, stat))
+
+        if len(misses) > _PARALLEL_LOAD_THRESHOLD:
+            with ThreadPoolExecutor(max_workers=min(_MAX_LOAD_WORKERS, len(misses))) as executor:
+                loaded = list(executor.map(lambda m: self._load_schedule(*m), misses))
+        else:
+            loaded = [self._load_schedule(*m) for m in misses]
+        schedules.extend(s for s in loaded if s)
+
+        if predicate is not None:
+            schedules = [s for s in schedules if predicate(s)]
+        schedules = [s.model_copy(deep=True) for s in schedules]
+
         # 按创建时间倒序
         schedules.sort(key=lambda s: s.created_at, reverse=True)
         return schedules
 
+    def list_schedules(self) -> List[ScheduleMetadata]:
+        """列出所有 Schedules"""
+        return self._scan_schedules()
+
+    def list_active(self) -> List[ScheduleMetadata]:
+        """列出所有 active 状态的 Schedules"""
+        return self._scan_schedules(lambda s: s.status == ScheduleStatus.ACTIVE)
+
     def update_schedule(self, schedule_id: str, schedule: ScheduleMetadata) -> None:
         """更新 Schedule"""
         schedule.updated_at = datetime.utcnow()
         schedule_path = self._get_schedule_path(schedule_id)
-        with open(schedule_path, "w", encoding="utf-8") as f:
-            import yaml
-            yaml.dump(
-                schedule.model_dump(mode="json"),
-                f,
-                allow_unicode=True,
-                default_flow_style=False,
-            )
+        _write_document(schedule_path, _SCHEDULE_ADAPTER.dump_python(schedule, mode="json"))
+        self._cache.pop(schedule_id, None)
         logger.info(f"Schedule updated: {schedule_id}")
 
     def delete_schedule(self, schedule_id: str) -> None:
         """删除 Schedule"""
         schedule_dir = self._get_schedule_dir(schedule_id)
-        import shutil
+        self._cache.pop(schedule_id, None)
+        self._execution_counts.pop(schedule_id, None)
         if schedule_dir.exists():
             shutil.rmtree(schedule_dir)
             logger.info(f"Schedule deleted: {schedule_id}")
 
-    def add_execution(self, schedule_id: str, execution: ScheduleExecution) -> None:
-        """添加执行记录"""
+    def _migrate_legacy_executions(self, schedule_id: str) -> None:
+        """将旧版 executions.yml 转换为 executions.ndjson"""
+        legacy_path = self._get_legacy_executions_path(schedule_id)
+        if not legacy_path.exists():
+            return
+
+        try:
+            data = _read_document(legacy_path) or []
+        except Exception as e:
+            logger.error(f"Failed to migrate executions for {schedule_id}: {e}")
+            data = []
+        data.sort(key=lambda item: item.get("executed_at") or "")
+        lines = [orjson.dumps(item) + b"\n" for item in data[-_EXECUTIONS_RETENTION:]]
+
         executions_path = self._get_executions_path(schedule_id)
+        _atomic_write_bytes(executions_path, b"".join(lines))
+        legacy_path.unlink()
+        self._execution_counts[schedule_id] = len(lines)
 
-        # 加载现有执行记录
-        executions = self.list_executions(schedule_id, limit=1000)
+    def _compact_executions(self, schedule_id: str) -> None:
+        """压缩执行记录，仅保留最近 _EXECUTIONS_RETENTION 条"""
+        executions_path = self._get_executions_path(schedule_id)
+        with open(executions_path, "rb") as f:
+            lines = deque(
+                (line for line in f if _parse_ndjson_line(line) is not None),
+                maxlen=_EXECUTIONS_RETENTION,
+            )
+
+        _atomic_write_bytes(executions_path, b"".join(lines))
+        self._execution_counts[schedule_id] = len(lines)
 
-        # 添加新记录
-        executions.append(execution)
+    def add_execution(self, schedule_id: str, execution: ScheduleExecution) -> None:
+        """添加执行记录（追加一行 NDJSON）"""
+        self._migrate_legacy_executions(schedule_id)
+        executions_path = self._get_executions_path(schedule_id)
 
-        # 只保留最近 100 条
-        executions = executions[-100:]
+        count = self._execution_counts.get(schedule_id)
+        if count is None:
+            count = 0
+            if executions_path.exists():
+                with open(executions_path, "rb") as f:
+                    count = sum(1 for line in f if line.strip())
 
-        # 保存
-        with open(executions_path, "w", encoding="utf-8") as f:
-            import yaml
-            yaml.dump(
-                [e.model_dump(mode="json") for e in executions],
-                f,
-                allow_unicode=True,
-                default_flow_style=False,
-            )
+        record = orjson.dumps(_EXECUTION_ADAPTER.dump_python(execution, mode="json")) + b"\n"
+        with open(executions_path, "ab+") as f:
+            # 上次追加被中断时末尾是未写完的行：先补换行，避免新记录与残行拼接后一并被丢弃
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    record = b"\n" + record
+            f.write(record)
+        self._execution_counts[schedule_id] = count + 1
+
+        if count + 1 > 2 * _EXECUTIONS_RETENTION:
+            self._compact_executions(schedule_id)
 
     def list_executions(self, schedule_id: str, limit: int = 100) -> List[ScheduleExecution]:
         """获取执行历史"""
         executions_path = self._get_executions_path(schedule_id)
-        if not executions_path.exists():
-            return []
+        legacy_path = self._get_legacy_executions_path(schedule_id)
 
         try:
-            import yaml
-            with open(executions_path, "r", encoding="utf-8") as f:
-                data = yaml.safe_load(f) or []
-            executions = [ScheduleExecution(**item) for item in data]
+            if executions_path.exists():
+                # 文件按时间顺序追加：只保留末尾 limit 行，倒序即为按执行时间倒序
+                with open(executions_path, "rb") as f:
+                    parsed = (_parse_ndjson_line(line) for line in f)
+                    data = deque((item for item in parsed if item is not None), maxlen=limit)
+                data.reverse()
+                return _EXECUTION_LIST_ADAPTER.validate_python(list(data))
+
+            if not legacy_path.exists():
+                return []
+            data = _read_document(legacy_path) or []
+            executions = _EXECUTION_LIST_ADAPTER.validate_python(data)
             # 按执行时间倒序，取前 N 条
-            executions.sort(key=lambda e: e.executed_at, reverse=True)
-            return executions[:limit]
+            return heapq.nlargest(limit, executions, key=lambda e: e.executed_at)
         except Exception as e:
             logger.error(f"Failed to load executions for {schedule_id}: {e}")
             return []
 
-    def save_build_log(self, schedule_id: str, log_filename: str, content: str) -> None:
-        """保存构建日志"""
-        log_path = self._get_schedule_dir(schedule_id) / "logs" / log_filename
-        with open(log_path, "w", encoding="utf-8") as f:
-            f.write(content)
+    def save_build_log(self, schedule_id: str, log_filename: str, content: Union[str, Iterable[bytes]]) -> None:
+        """保存构建日志（流式写入 gzip 压缩文件 {log_filename}.gz）"""
+        log_dir = self._get_schedule_dir(schedule_id) / "logs"
+        log_dir.mkdir(exist_ok=True)
+        log_path = log_dir / f"{log_filename}.gz"
+        chunks = [content.encode("utf-8")] if isinstance(content, str) else content
+
+        tmp_path = log_path.with_suffix(log_path.suffix + ".tmp")
+        with open(tmp_path, "wb") as f:
+            # compresslevel=1：日志为纯文本，低压缩级别已足够且几乎不占 CPU
+            with gzip.GzipFile(filename=log_filename, mode="wb", compresslevel=1, fileobj=f) as gz:
+                for chunk in chunks:
+                    gz.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, log_path)
         logger.info(f"Build log saved: {log_path}")
 
     def get_build_log(self, schedule_id: str, log_filename: str) -> Optional[str]:
-        """获取构建日志内容"""
-        log_path = self._get_schedule_dir(schedule_id) / "logs" / log_filename
-        if not log_path.exists():
-            return None
+        """获取构建日志内容（优先读取 .gz，兼容未压缩的旧日志）"""
+        log_dir = self._get_schedule_dir(schedule_id) / "logs"
+        gz_path = log_dir / f"{log_filename}.gz"
+        log_path = log_dir / log_filename
         try:
-            with open(log_path, "r", encoding="utf-8") as f:
-                return f.read()
+            if gz_path.exists():
+                with gzip.open(gz_path, "rt", encoding="utf-8", errors="replace") as f:
+                    return f.read()
+            if log_path.exists():
+                with open(log_path, "r", encoding="utf-8") as f:
+                    return f.read()
+            return None
         except Exception as e:
             logger.error(f"Failed to read log {log_filename}: {e}")
             return None
@@ -1,50 +1,45 @@
 """
-APScheduler 调度器服务
+调度器服务
 
-负责管理和执行定时任务
+负责管理和执行定时任务。所有 Schedule 按下次执行时间放入最小堆，
+由单个后台协程睡眠到堆顶时间后统一派发。
 """
+import asyncio
+import heapq
 import logging
-from datetime import datetime
-from typing import Optional
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
 
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.cron import CronTrigger
-from apscheduler.triggers.date import DateTrigger
-from apscheduler.jobstores.memory import MemoryJobStore
-from apscheduler.executors.asyncio import AsyncIOExecutor
-
-from src.models.schedule import ScheduleMetadata, ScheduleRepeat, ScheduleStatus
+from src.models.schedule import ScheduleMetadata, ScheduleRepeat, ScheduleStatus, to_utc_naive
 from src.services.schedule_runner import schedule_runner
 from src.services.schedule_storage import schedule_storage
 
 logger = logging.getLogger(__name__)
 
+# 错过任务的宽限时间（秒）
+_MISFIRE_GRACE_TIME = 3600
+
 
 class SchedulerService:
-    """APScheduler 调度器服务"""
+    """基于最小堆的调度器服务"""
 
     def __init__(self):
         """初始化调度器"""
-        # 配置 JobStore 和 Executor
-        jobstores = {
-            "default": MemoryJobStore(),
-        }
-        executors = {
-            "default": AsyncIOExecutor(),
-        }
-        job_defaults = {
-            "coalesce": True,  # 合并错过的任务
-            "max_instances": 1,  # 同一任务最多同时运行 1 个实例
-            "misfire_grace_time": 3600,  # 错过任务的宽限时间（秒）
-        }
-
-        self.scheduler = AsyncIOScheduler(
-            jobstores=jobstores,
-            executors=executors,
-            job_defaults=job_defaults,
-            timezone="UTC",
-        )
-
+        # 堆元素：(下次执行时间, 序号, schedule_id)；序号用于判断条目是否仍有效（惰性删除）
+        self._heap: List[Tuple[datetime, int, str]] = []
+        self._entries: Dict[str, Tuple[datetime, int]] = {}
+        self._seq = 0
+
+        # 已登记的 Schedule（含已暂停的），用于计算下次执行时间
+        self._schedules: Dict[str, ScheduleMetadata] = {}
+        # 登记时的触发参数 (repeat, start_time)，未变化时更新无需重新计算
+        self._trigger_keys: Dict[str, Tuple[ScheduleRepeat, datetime]] = {}
+        # 正在执行的 Schedule（同一 Schedule 最多同时运行 1 个实例）
+        self._executing: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher_task: Optional[asyncio.Task] = None
         self._running = False
 
     async def start(self) -> None:
@@ -53,14 +48,15 @@ class SchedulerService:
             logger.warning("Scheduler is already running")
             return
 
-        self.scheduler.start()
+        self._wakeup = asyncio.Event()
+        self._dispatcher_task = asyncio.create_task(self._dispatcher())
         self._running = True
         logger.info("Scheduler started")
 
         # 加载所有 Schedules
         await self.load_schedules()
 
-    def shutdown(self, wait: bool = True) -> None:
+    async def shutdown(self, wait: bool = True) -> None:
         """
         关闭调度器
 
@@ -71,8 +67,18 @@ class SchedulerService:
             logger.warning("Scheduler is not running")
             return
 
-        self.scheduler.shutdown(wait=wait)
         self._running = False
+        if self._dispatcher_task:
+            self._dispatcher_task.cancel()
+            await asyncio.gather(self._dispatcher_task, return_exceptions=True)
+            self._dispatcher_task = None
+
+        if self._tasks:
+            if not wait:
+                for task in self._tasks:
+                    task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
         logger.info("Scheduler shutdown")
 
     def add_schedule(self, schedule: ScheduleMetadata) -> None:
@@ -86,20 +92,25 @@ class SchedulerService:
             logger.info(f"Schedule {schedule.schedule_id} is not active, skipping")
             return
 
-        # 创建触发器
-        trigger = self._create_trigger(schedule)
+        now = datetime.utcnow()
+        if schedule.repeat == ScheduleRepeat.NONE:
+            run_at = to_utc_naive(schedule.start_time)
+            # 已执行过的单次任务不再触发
+            if schedule.last_execution and to_utc_naive(schedule.last_execution) >= run_at:
+                logger.info(f"Schedule {schedule.schedule_id} has already run, skipping")
+                return
+            # 已过期（超出宽限时间）的单次任务不会再触发
+            if run_at + timedelta(seconds=_MISFIRE_GRACE_TIME) < now:
+                logger.info(f"Schedule {schedule.schedule_id} start time has passed, skipping")
+                return
+        else:
+            run_at = schedule.compute_next_execution(after=now)
 
-        # 添加任务
-        self.scheduler.add_job(
-            func=self._execute_schedule,
-            trigger=trigger,
-            id=schedule.schedule_id,
-            args=[schedule.schedule_id],
-            name=schedule.name,
-            replace_existing=True,
-        )
+        self._schedules[schedule.schedule_id] = schedule
+        self._trigger_keys[schedule.schedule_id] = (schedule.repeat, schedule.start_time)
+        self._push(schedule.schedule_id, run_at)
 
-        logger.info(f"Schedule added: {schedule.schedule_id} (next_run: {schedule.next_execution})")
+        logger.info(f"Schedule added: {schedule.schedule_id} (next_run: {run_at})")
 
     def remove_schedule(self, schedule_id: str) -> None:
         """
@@ -108,11 +119,12 @@ class SchedulerService:
         Args:
             schedule_id: Schedule ID
         """
-        try:
-            self.scheduler.remove_job(schedule_id)
-            logger.info(f"Schedule removed: {schedule_id}")
-        except Exception as e:
-            logger.warning(f"Failed to remove schedule {schedule_id}: {e}")
+        known = self._schedules.pop(schedule_id, None) is not None
+        self._trigger_keys.pop(schedule_id, None)
+        if self._entries.pop(schedule_id, None) is None and not known:
+            logger.warning(f"Failed to remove schedule {schedule_id}: not scheduled")
+            return
+        logger.info(f"Schedule removed: {schedule_id}")
 
     def update_schedule(self, schedule: ScheduleMetadata) -> None:
         """
@@ -121,10 +133,20 @@ class SchedulerService:
         Args:
             schedule: Schedule 元数据
         """
-        # 移除旧的
-        self.remove_schedule(schedule.schedule_id)
+        if schedule.status != ScheduleStatus.ACTIVE:
+            self.remove_schedule(schedule.schedule_id)
+            return
 
-        # 添加新的
+        schedule_id = schedule.schedule_id
+        if (
+            schedule_id in self._entries
+            and self._trigger_keys.get(schedule_id) == (schedule.repeat, schedule.start_time)
+        ):
+            # 触发参数未变（如执行后的更新）：堆中已有下次执行时间，仅替换元数据
+            self._schedules[schedule_id] = schedule
+            return
+
+        # 旧的堆条目由序号失效，无需在堆中查找删除
         self.add_schedule(schedule)
 
     def pause_schedule(self, schedule_id: str) -> None:
@@ -134,11 +156,10 @@ class SchedulerService:
         Args:
             schedule_id: Schedule ID
         """
-        try:
-            self.scheduler.pause_job(schedule_id)
-            logger.info(f"Schedule paused: {schedule_id}")
-        except Exception as e:
-            logger.warning(f"Failed to pause schedule {schedule_id}: {e}")
+        if self._entries.pop(schedule_id, None) is None:
+            logger.warning(f"Failed to pause schedule {schedule_id}: not scheduled")
+            return
+        logger.info(f"Schedule paused: {schedule_id}")
 
     def resume_schedule(self, schedule_id: str) -> None:
         """
@@ -147,26 +168,105 @@ class SchedulerService:
         Args:
             schedule_id: Schedule ID
         """
-        try:
-            self.scheduler.resume_job(schedule_id)
-            logger.info(f"Schedule resumed: {schedule_id}")
-        except Exception as e:
-            logger.warning(f"Failed to resume schedule {schedule_id}: {e}")
+        schedule = schedule_storage.get_schedule(schedule_id) or self._schedules.get(schedule_id)
+        if not schedule:
+            logger.warning(f"Failed to resume schedule {schedule_id}: not found")
+            return
+
+        self.add_schedule(schedule)
+        logger.info(f"Schedule resumed: {schedule_id}")
 
     async def load_schedules(self) -> None:
         """从存储加载所有 Schedules"""
-        schedules = schedule_storage.list_schedules()
+        schedules = schedule_storage.list_active()
+        if not schedules:
+            return
 
-        logger.info(f"Loading {len(schedules)} schedules")
+        logger.info(f"Loading {len(schedules)} active schedules")
 
+        now = datetime.utcnow()
         for schedule in schedules:
-            if schedule.status == ScheduleStatus.ACTIVE:
-                # 检查是否需要立即执行
-                if schedule.next_execution and schedule.next_execution <= datetime.utcnow():
-                    logger.info(f"Schedule {schedule.schedule_id} is due, executing now")
-                    await self._execute_schedule(schedule.schedule_id)
-                else:
-                    self.add_schedule(schedule)
+            # 检查是否需要立即执行
+            if schedule.next_execution and schedule.next_execution <= now:
+                logger.info(f"Schedule {schedule.schedule_id} is due, executing now")
+                await self._execute_schedule_obj(schedule)
+            else:
+                if schedule.next_execution is None:
+                    schedule.next_execution = schedule.compute_next_execution(after=now)
+                self.add_schedule(schedule)
+
+    def _push(self, schedule_id: str, run_at: Optional[datetime]) -> None:
+        """
+        将 Schedule 的下次执行时间压入堆
+
+        Args:
+            schedule_id: Schedule ID
+            run_at: 下次执行时间（UTC）；为 None 时仅作废旧条目
+        """
+        if run_at is None:
+            self._entries.pop(schedule_id, None)
+            return
+
+        run_at = to_utc_naive(run_at)
+        self._seq += 1
+        self._entries[schedule_id] = (run_at, self._seq)
+        heapq.heappush(self._heap, (run_at, self._seq, schedule_id))
+
+        # 新条目早于当前堆顶时唤醒派发协程重新计算等待时间
+        if self._wakeup and self._heap[0][1] == self._seq:
+            self._wakeup.set()
+
+    async def _dispatcher(self) -> None:
+        """派发协程：睡眠到堆顶时间，弹出到期条目并执行"""
+        while True:
+            # 丢弃已失效的堆顶条目
+            while self._heap:
+                run_at, seq, schedule_id = self._heap[0]
+                if self._entries.get(schedule_id) == (run_at, seq):
+                    break
+                heapq.heappop(self._heap)
+
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            run_at, seq, schedule_id = self._heap[0]
+            now = datetime.utcnow()
+            delay = (run_at - now).total_seconds()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._heap)
+            del self._entries[schedule_id]
+
+            schedule = self._schedules.get(schedule_id)
+            if schedule is not None:
+                # 合并错过的执行：直接跳到晚于当前时间的下一次
+                self._push(schedule_id, schedule.compute_next_execution(after=now))
+
+            if (now - run_at).total_seconds() > _MISFIRE_GRACE_TIME:
+                logger.warning(f"Schedule {schedule_id} missed its run time {run_at}, skipping")
+                continue
+            if schedule_id in self._executing:
+                logger.warning(f"Schedule {schedule_id} is still running, skipping")
+                continue
+
+            task = asyncio.create_task(self._run_schedule(schedule_id))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_schedule(self, schedule_id: str) -> None:
+        """执行 Schedule 并维护运行中集合"""
+        self._executing.add(schedule_id)
+        try:
+            await self._execute_schedule(schedule_id)
+        finally:
+            self._executing.discard(schedule_id)
 
     async def _execute_schedule(self, schedule_id: str) -> None:
         """
@@ -177,19 +277,30 @@ class SchedulerService:
         """
         logger.info(f"Executing schedule: {schedule_id}")
 
-        try:
-            # 从存储加载最新的 Schedule
-            schedule = schedule_storage.get_schedule(schedule_id)
-            if not schedule:
-                logger.error(f"Schedule not found: {schedule_id}")
-                return
+        # 从存储加载最新的 Schedule
+        schedule = schedule_storage.get_schedule(schedule_id)
+        if not schedule:
+            logger.error(f"Schedule not found: {schedule_id}")
+            return
+
+        await self._execute_schedule_obj(schedule)
 
+    async def _execute_schedule_obj(self, schedule: ScheduleMetadata) -> None:
+        """
+        执行已加载的 Schedule
+
+        Args:
+            schedule: Schedule 元数据
+        """
+        schedule_id = schedule.schedule_id
+
+        try:
             # 检查状态
             if schedule.status != ScheduleStatus.ACTIVE:
                 logger.info(f"Schedule {schedule_id} is not active, skipping")
                 return
 
-            # 执行 Schedule
+            # 执行 Schedule（执行器会更新并保存 schedule 对象）
             execution = await schedule_runner.execute(schedule)
 
             logger.info(
@@ -197,64 +308,16 @@ class SchedulerService:
                 f"job_id={execution.job_id}, status={execution.build_status}"
             )
 
-            # 重新加载 Schedule（可能已更新）
-            updated_schedule = schedule_storage.get_schedule(schedule_id)
-            if updated_schedule and updated_schedule.status == ScheduleStatus.ACTIVE:
+            if schedule.status == ScheduleStatus.ACTIVE and schedule.repeat != ScheduleRepeat.NONE:
                 # 更新调度器中的任务
-                self.update_schedule(updated_schedule)
+                self.update_schedule(schedule)
+            else:
+                # 单次任务执行后即结束，不再放回堆中
+                self.remove_schedule(schedule_id)
 
         except Exception as e:
             logger.exception(f"Failed to execute schedule {schedule_id}: {e}")
 
-    def _create_trigger(self, schedule: ScheduleMetadata):
-        """
-        创建触发器
-
-        Args:
-            schedule: Schedule 元数据
-
-        Returns:
-            Trigger 对象
-        """
-        if schedule.repeat == ScheduleRepeat.NONE:
-            # 单次执行
-            return DateTrigger(run_date=schedule.start_time, timezone="UTC")
-
-        # 定时执行（使用 CronTrigger）
-        # 注意：APScheduler 3.x 的 CronTrigger 使用 cron 表达式
-        # 这里我们简化处理，只支持每天的固定时间
-        hour = schedule.start_time.hour
-        minute = schedule.start_time.minute
-
-        if schedule.repeat == ScheduleRepeat.DAILY:
-            # 每天执行
-            return CronTrigger(
-                hour=hour,
-                minute=minute,
-                timezone="UTC",
-            )
-        elif schedule.repeat == ScheduleRepeat.WEEKLY:
-            # 每周执行（在相同的星期几）
-            day_of_week = schedule.start_time.weekday()
-            return CronTrigger(
-                day_of_week=day_of_week,
-                hour=hour,
-                minute=minute,
-                timezone="UTC",
-            )
-        elif schedule.repeat == ScheduleRepeat.MONTHLY:
-            # 每月执行（在相同的日期）
-            day = schedule.start_time.day
-            return CronTrigger(
-                day=day,
-                hour=hour,
-                minute=minute,
-                timezone="UTC",
-            )
-        else:
-            # 默认单次执行
-            return DateTrigger(run_date=schedule.start_time, timezone="UTC")
-
     def get_next_run_time(self, schedule_id: str) -> Optional[datetime]:
         """
         获取 Schedule 的下次执行时间
@@ -265,11 +328,8 @@ class SchedulerService:
         Returns:
             下次执行时间，如果不存在则返回 None
         """
-        try:
-            job = self.scheduler.get_job(schedule_id)
-            return job.next_run_time if job else None
-        except Exception:
-            return None
+        entry = self._entries.get(schedule_id)
+        return entry[0].replace(tzinfo=timezone.utc) if entry else None
 
     def list_scheduled_jobs(self) -> list[dict]:
         """
@@ -279,11 +339,12 @@ class SchedulerService:
             任务信息列表
         """
         jobs = []
-        for job in self.scheduler.get_jobs():
+        for schedule_id, (run_at, _) in sorted(self._entries.items(), key=lambda item: item[1]):
+            schedule = self._schedules.get(schedule_id)
             jobs.append({
-                "id": job.id,
-                "name": job.name,
-                "next_run_time": job.next_run_time,
+                "id": schedule_id,
+                "name": schedule.name if schedule else schedule_id,
+                "next_run_time": run_at.replace(tzinfo=timezone.utc),
             })
         return jobs
 
@@ -3,15 +3,16 @@
 
 负责任务元数据的持久化和检索（使用文件系统 + JSON）
 """
+import asyncio
 import json
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional, Set
 
 from nanoid import generate
 
 from src.config import settings
-from src.models import Job, JobMetadata, JobStatus
+from src.models import Job, JobMetadata, JobMode, JobStatus
 
 
 class JobStorage:
@@ -26,6 +27,8 @@ class JobStorage:
         """
         self.root_dir = (root_dir or settings.jobs_root_dir).resolve()
         self.root_dir.mkdir(parents=True, exist_ok=True)
+        # job_id -> 尚未执行的延迟写入
+        self._pending_flushes: Dict[str, asyncio.TimerHandle] = {}
 
     def create_job(self, metadata: JobMetadata) -> Job:
         """
@@ -88,13 +91,45 @@ class JobStorage:
         Args:
             job: 任务对象
         """
+        # 完整写入会覆盖尚未执行的延迟写入
+        handle = self._pending_flushes.pop(job.job_id, None)
+        if handle:
+            handle.cancel()
+
         job.metadata.updated_at = datetime.utcnow()
         self._save_metadata(job)
 
+    def update_job_debounced(self, job: Job, min_interval: float = 0.2) -> None:
+        """
+        延迟更新任务元数据，合并 min_interval 秒内的多次更新为一次写入
+
+        需在事件循环中调用；无运行中的事件循环时直接写入。
+
+        Args:
+            job: 任务对象
+            min_interval: 最小写入间隔（秒）
+        """
+        if job.job_id in self._pending_flushes:
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.update_job(job)
+            return
+
+        self._pending_flushes[job.job_id] = loop.call_later(min_interval, self._flush_pending, job)
+
+    def _flush_pending(self, job: Job) -> None:
+        """延迟写入回调"""
+        self._pending_flushes.pop(job.job_id, None)
+        self.update_job(job)
+
     def list_jobs(
         self,
         status: Optional[JobStatus] = None,
         limit: Optional[int] = None,
+        modes: Optional[Set[JobMode]] = None,
     ) -> List[Job]:
         """
         列出所有任务
@@ -102,6 +137,7 @@ class JobStorage:
         Args:
             status: 可选的状态过滤
             limit: 可选的数量限制
+            modes: 可选的任务模式过滤
 
         Returns:
             任务列表，按创建时间倒序排列
@@ -112,6 +148,8 @@ class JobStorage:
         if not self.root_dir.exists():
             return jobs
 
+        mode_values = {m.value for m in modes} if modes else None
+
         for job_dir in self.root_dir.iterdir():
             if not job_dir.is_dir():
                 continue
@@ -123,13 +161,15 @@ class JobStorage:
             try:
                 with open(metadata_path, "r", encoding="utf-8") as f:
                     metadata_dict = json.load(f)
-                    metadata = JobMetadata(**metadata_dict)
 
-                    # 状态过滤
-                    if status and metadata.status != status:
-                        continue
+                # 在模型校验前按原始字段过滤
+                if status and metadata_dict.get("status") != status.value:
+                    continue
+                if mode_values is not None and metadata_dict.get("mode") not in mode_values:
+                    continue
 
-                    jobs.append(Job(metadata=metadata, job_dir=job_dir))
+                metadata = JobMetadata(**metadata_dict)
+                jobs.append(Job(metadata=metadata, job_dir=job_dir))
             except Exception:
                 # 跳过无效的元数据文件
                 continue
@@ -155,6 +195,10 @@ class JobStorage:
         """
         job_dir = self.root_dir / job_id
 
+        handle = self._pending_flushes.pop(job_id, None)
+        if handle:
+            handle.cancel()
+
         if not job_dir.exists():
             return False
 
@@ -6,12 +6,14 @@ Stream Analysis 后台处理器
 from __future__ import annotations
 
 import asyncio
-import json
 import logging
+import os
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Set, Tuple
 
+import numpy as np
+import orjson
 from nanoid import generate
 
 from src.config import settings
@@ -27,29 +29,63 @@ def _now_tz():
     return datetime.now().astimezone()
 
 
+def _write_json(path: Path, data: Any) -> None:
+    # orjson 一次性生成 bytes 后直接写入，不经过 str 中间结果
+    payload = orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    with open(path, "wb") as f:
+        f.write(payload)
+
+
+# 帧类型以单字符编码存储（报告中为一个字符串，每帧一个字符）
+_FRAME_TYPE_RAW = "R"
+_FRAME_TYPE_UNKNOWN = ord("U")
+
+
 def _is_yuv(path: Path) -> bool:
     return path.suffix.lower() == ".yuv"
 
 
-def _frame_size_bytes_yuv420p(width: int, height: int) -> int:
-    return (width * height * 3) // 2
+# (路径, mtime_ns, 大小) -> (输入格式, 视频信息)，避免对同一文件重复 ffprobe
+_PROBE_CACHE: Dict[Tuple[str, int, int], Tuple[Optional[str], Dict[str, Any]]] = {}
+_PROBE_CACHE_MAX = 1024
 
 
-async def _infer_input_format(path: Path) -> Optional[str]:
-    if path.stat().st_size == 0:
+async def _probe_input(path: Path) -> Tuple[Optional[str], Dict[str, Any]]:
+    """
+    推断码流输入格式并返回对应的视频信息
+
+    Returns:
+        (input_format, info)：input_format 为 None 表示容器格式（自动探测）
+    """
+    st = path.stat()
+    if st.st_size == 0:
         raise RuntimeError(f"文件为空: {path.name}")
 
+    key = (str(path), st.st_mtime_ns, st.st_size)
+    cached = _PROBE_CACHE.get(key)
+    if cached is not None:
+        return cached
+
     suffix = path.suffix.lower()
     if suffix in {".h264", ".264"}:
-        return "h264"
-    if suffix in {".h265", ".265", ".hevc"}:
-        return "hevc"
+        result = ("h264", await ffmpeg_service.get_video_info(path, input_format="h264"))
+    elif suffix in {".h265", ".265", ".hevc"}:
+        result = ("hevc", await ffmpeg_service.get_video_info(path, input_format="hevc"))
+    else:
+        result = await _detect_input_format(path)
+
+    if len(_PROBE_CACHE) >= _PROBE_CACHE_MAX:
+        _PROBE_CACHE.pop(next(iter(_PROBE_CACHE)))
+    _PROBE_CACHE[key] = result
+    return result
 
+
+async def _detect_input_format(path: Path) -> Tuple[Optional[str], Dict[str, Any]]:
     # Container/auto probe
     try:
         info = await ffmpeg_service.get_video_info(path)
         if info.get("width") and info.get("height"):
-            return None
+            return None, info
     except Exception:
         pass
 
@@ -58,7 +94,7 @@ async def _infer_input_format(path: Path) -> Optional[str]:
             info = await ffmpeg_service.get_video_info(path, input_format=fmt)
             codec_name = info.get("codec_name")
             if info.get("width") and info.get("height") and codec_name == codec:
-                return fmt
+                return fmt, info
         except Exception:
             continue
 
@@ -68,6 +104,9 @@ async def _infer_input_format(path: Path) -> Optional[str]:
 def _make_command_callbacks(job, job_storage):
     from src.models import CommandLog, CommandStatus
 
+    # command_id -> CommandLog，避免每次状态更新线性扫描
+    index = {log.command_id: log for log in job.metadata.command_logs}
+
     def add_command_log(command_type: str, command: str, source_file: str = None) -> str:
         command_id = generate(size=8)
         log = CommandLog(
@@ -78,22 +117,22 @@ def _make_command_callbacks(job, job_storage):
             source_file=source_file,
         )
         job.metadata.command_logs.append(log)
-        job_storage.update_job(job)
+        index[command_id] = log
+        job_storage.update_job_debounced(job)
         return command_id
 
     def update_command_status(command_id: str, status: str, error: str = None):
-        for cmd_log in job.metadata.command_logs:
-            if cmd_log.command_id == command_id:
-                cmd_log.status = CommandStatus(status)
-                now = _now_tz()
-                if status == "running":
-                    cmd_log.started_at = now
-                elif status in ("completed", "failed"):
-                    cmd_log.completed_at = now
-                if error:
-                    cmd_log.error_message = error
-                break
-        job_storage.update_job(job)
+        cmd_log = index.get(command_id)
+        if cmd_log:
+            cmd_log.status = CommandStatus(status)
+            now = _now_tz()
+            if status == "running":
+                cmd_log.started_at = now
+            elif status in ("completed", "failed"):
+                cmd_log.completed_at = now
+            if error:
+                cmd_log.error_message = error
+        job_storage.update_job_debounced(job)
 
     return add_command_log, update_command_status
 
@@ -150,8 +189,7 @@ async def build_bitstream_report(
         else:
             ref_width, ref_height, ref_fps = raw_width, raw_height, float(raw_fps)
     else:
-        ref_input_format = await _infer_input_format(reference_path)
-        ref_info = await ffmpeg_service.get_video_info(reference_path, input_format=ref_input_format)
+        ref_input_format, ref_info = await _probe_input(reference_path)
         ref_width = int(ref_info.get("width") or 0)
         ref_height = int(ref_info.get("height") or 0)
         ref_fps_val = ref_info.get("fps")
@@ -161,11 +199,14 @@ async def build_bitstream_report(
             raise ValueError("无法解析参考视频帧率（如为裸码流且未携带 VUI，请改用 yuv 输入并填写 fps）")
         ref_fps = float(ref_fps_val)
 
-    # 2) 对每个 Encoded：使用管道方式计算指标
-    encoded_reports: List[Dict[str, Any]] = []
-    encoded_summaries: List[Dict[str, Any]] = []
+    # 2) 对每个 Encoded：使用管道方式计算指标（各 Encoded 互不依赖，并行执行）
+    sem = asyncio.Semaphore(min(len(encoded_paths), os.cpu_count() or 4))
 
-    for idx, enc_input in enumerate(encoded_paths):
+    async def _process_one(enc_input: Path) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        async with sem:
+            return await _analyze_encoded(enc_input)
+
+    async def _analyze_encoded(enc_input: Path) -> Tuple[Dict[str, Any], Dict[str, Any]]:
         if not enc_input.exists():
             raise FileNotFoundError(f"编码视频不存在: {enc_input.name}")
 
@@ -190,8 +231,7 @@ async def build_bitstream_report(
                         f"检测到 .yuv，文件名需包含 _WxH_FPS，例如 video_1920x1080_30.yuv: {enc_input.name}"
                     ) from exc
         else:
-            enc_input_format = await _infer_input_format(enc_input)
-            info = await ffmpeg_service.get_video_info(enc_input, input_format=enc_input_format)
+            enc_input_format, info = await _probe_input(enc_input)
             enc_codec = info.get("codec_name")
             enc_width = int(info.get("width") or 0)
             enc_height = int(info.get("height") or 0)
@@ -204,104 +244,147 @@ async def build_bitstream_report(
         enc_analysis_dir = analysis_dir / enc_input.stem
         enc_analysis_dir.mkdir(parents=True, exist_ok=True)
 
-        metrics_result = await ffmpeg_service.calculate_metrics_pipeline(
-            reference_path=reference_path,
-            encoded_path=enc_input,
-            analysis_dir=enc_analysis_dir,
-            src_width=ref_width,
-            src_height=ref_height,
-            src_fps=ref_fps,
-            enc_width=enc_width,
-            enc_height=enc_height,
-            enc_fps=enc_fps,
-            upscale_to_source=upscale_to_source,
-            ref_input_format=ref_input_format,
-            enc_input_format=enc_input_format,
-            ref_is_yuv=ref_is_yuv,
-            enc_is_yuv=enc_is_yuv,
-            ref_pix_fmt=raw_pix_fmt,
-            enc_pix_fmt=raw_pix_fmt,
-            target_fps=target_fps,
-            add_command_callback=add_command_callback,
-            update_status_callback=update_status_callback,
-        )
+        # 帧结构探测与打分互不依赖：与打分管道并行执行
+        frames_task: Optional[asyncio.Task] = None
+        if not enc_is_yuv:
+            frames_task = asyncio.create_task(
+                ffmpeg_service.probe_video_frames(enc_input, input_format=enc_input_format)
+            )
+
+        try:
+            metrics_result = await ffmpeg_service.calculate_metrics_pipeline(
+                reference_path=reference_path,
+                encoded_path=enc_input,
+                analysis_dir=enc_analysis_dir,
+                src_width=ref_width,
+                src_height=ref_height,
+                src_fps=ref_fps,
+                enc_width=enc_width,
+                enc_height=enc_height,
+                enc_fps=enc_fps,
+                upscale_to_source=upscale_to_source,
+                ref_input_format=ref_input_format,
+                enc_input_format=enc_input_format,
+                ref_is_yuv=ref_is_yuv,
+                enc_is_yuv=enc_is_yuv,
+                ref_pix_fmt=raw_pix_fmt,
+                enc_pix_fmt=raw_pix_fmt,
+                target_fps=target_fps,
+                add_command_callback=add_command_callback,
+                update_status_callback=update_status_callback,
+            )
+        except BaseException:
+            if frames_task:
+                frames_task.cancel()
+            raise
 
         psnr_data = metrics_result.get("psnr", {})
         ssim_data = metrics_result.get("ssim", {})
         vmaf_data = metrics_result.get("vmaf", {})
 
         # 2.3 码率/帧结构
-        frame_types: List[str] = []
-        frame_sizes: List[int] = []
-        frame_timestamps: List[float] = []
-        frames_used: int = 0
+        frame_types: str
+        frame_sizes: List[int]
+        frame_timestamps: List[float]
+        total_bytes: int
 
         if enc_is_yuv:
             # YUV 文件：计算帧数
-            frame_size = _frame_size_bytes_yuv420p(enc_width, enc_height)
-            enc_frames = enc_input.stat().st_size // frame_size if frame_size > 0 else 0
-            frames_used = enc_frames
-            frame_types = ["RAW"] * frames_used
+            frame_size = (enc_width * enc_height * 3) >> 1  # yuv420p
+            frames_used = enc_input.stat().st_size // frame_size if frame_size > 0 else 0
+            frame_types = _FRAME_TYPE_RAW * frames_used
             frame_sizes = [frame_size] * frames_used
-            frame_timestamps = [i / enc_fps for i in range(frames_used)]
+            total_bytes = frame_size * frames_used
+            timestamps = np.arange(frames_used, dtype=np.float64) / enc_fps
+            frame_timestamps = timestamps.tolist()
         else:
-            frames_info = await ffmpeg_service.probe_video_frames(enc_input, input_format=enc_input_format)
+            frames_info = await frames_task
+            # 预分配并单次遍历，同时累计总字节数
+            frames_used = len(frames_info)
+            type_codes = bytearray([_FRAME_TYPE_UNKNOWN]) * frames_used
+            frame_sizes = [0] * frames_used
+            total_bytes = 0
             for i, fr in enumerate(frames_info):
-                frame_types.append((fr.get("pict_type") or "UNK"))
-                frame_sizes.append(int(fr.get("pkt_size") or 0))
-                ts = fr.get("timestamp")
-                frame_timestamps.append(float(ts) if ts is not None else (i / enc_fps))
-            frames_used = len(frame_sizes)
+                size = int(fr.get("pkt_size") or 0)
+                frame_sizes[i] = size
+                total_bytes += size
+                pict_type = fr.get("pict_type")
+                if pict_type:
+                    type_codes[i] = ord(pict_type[0])
+
+            # 未携带时间戳（首尾帧均无）：按恒定帧率直接生成
+            if frames_used and (
+                frames_info[0].get("timestamp") is not None or frames_info[-1].get("timestamp") is not None
+            ):
+                frame_timestamps = [
+                    float(ts) if (ts := fr.get("timestamp")) is not None else i / enc_fps
+                    for i, fr in enumerate(frames_info)
+                ]
+                timestamps = np.asarray(frame_timestamps, dtype=np.float64)
+            else:
+                timestamps = np.arange(frames_used, dtype=np.float64) / enc_fps
+                frame_timestamps = timestamps.tolist()
+            frame_types = type_codes.decode("ascii", errors="replace")
 
         duration_seconds = frames_used / enc_fps if enc_fps > 0 else 0
-        avg_bitrate_bps = int((sum(frame_sizes) * 8) / duration_seconds) if duration_seconds > 0 else 0
+        avg_bitrate_bps = int((total_bytes * 8) / duration_seconds) if duration_seconds > 0 else 0
 
         # 判断是否进行了缩放
         scaled = (enc_width != ref_width or enc_height != ref_height)
 
-        encoded_reports.append(
-            {
-                "label": enc_label,
-                "format": enc_codec or "Unknown",
-                "width": enc_width,
-                "height": enc_height,
-                "fps": enc_fps,
-                "input_format": enc_input_format or "auto",
-                "codec": enc_codec,
-                "scaled_to_reference": scaled and upscale_to_source,
-                "frames_total": frames_used,
-                "frames_used": frames_used,
-                "frames_mismatch": False,
-                "metrics": {
-                    "psnr": psnr_data,
-                    "ssim": ssim_data,
-                    "vmaf": vmaf_data,
-                },
-                "bitrate": {
-                    "avg_bitrate_bps": avg_bitrate_bps,
-                    "frame_types": frame_types,
-                    "frame_sizes": frame_sizes,
-                    "frame_timestamps": frame_timestamps,
-                },
-            }
-        )
-
-        encoded_summaries.append(
-            {
-                "label": enc_label,
-                "scaled_to_reference": scaled and upscale_to_source,
-                "avg_bitrate_bps": avg_bitrate_bps,
-                "fps": enc_fps,
+        report = {
+            "label": enc_label,
+            "format": enc_codec or "Unknown",
+            "width": enc_width,
+            "height": enc_height,
+            "fps": enc_fps,
+            "input_format": enc_input_format or "auto",
+            "codec": enc_codec,
+            "scaled_to_reference": scaled and upscale_to_source,
+            "frames_total": frames_used,
+            "frames_used": frames_used,
+            "frames_mismatch": False,
+            "metrics": {
                 "psnr": psnr_data,
                 "ssim": ssim_data,
                 "vmaf": vmaf_data,
-                "bitrate": {
-                    "frame_types": frame_types,
-                    "frame_sizes": frame_sizes,
-                    "frame_timestamps": [round(t, 2) for t in frame_timestamps],
-                },
-            }
-        )
+            },
+            "bitrate": {
+                "avg_bitrate_bps": avg_bitrate_bps,
+                "frame_types": frame_types,
+                "frame_sizes": frame_sizes,
+                "frame_timestamps": frame_timestamps,
+            },
+        }
+
+        summary_item = {
+            "label": enc_label,
+            "scaled_to_reference": scaled and upscale_to_source,
+            "avg_bitrate_bps": avg_bitrate_bps,
+            "fps": enc_fps,
+            "psnr": psnr_data,
+            "ssim": ssim_data,
+            "vmaf": vmaf_data,
+            "bitrate": {
+                "frame_types": frame_types,
+                "frame_sizes": frame_sizes,
+                "frame_timestamps": np.round(timestamps, 2).tolist(),
+            },
+        }
+        return report, summary_item
+
+    tasks = [asyncio.create_task(_process_one(p)) for p in encoded_paths]
+    try:
+        # gather 结果顺序与 encoded_paths 一致
+        results = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+    encoded_reports: List[Dict[str, Any]] = [report for report, _ in results]
+    encoded_summaries: List[Dict[str, Any]] = [item for _, item in results]
 
     frames_used_overall = min(
         (item.get("frames_used", 0) for item in encoded_reports),
@@ -374,35 +457,32 @@ async def analyze_bitstream_job(
     report_data["job_id"] = job.job_id
 
     # 清理上传的源文件（仅删除任务目录内的副本，保留外部路径）
-    def _safe_unlink(path: Path) -> None:
+    def _safe_unlink(path: str) -> None:
         try:
-            path.unlink()
+            os.unlink(path)
         except FileNotFoundError:
             return
         except Exception:
             logger.warning(f"删除文件失败: {path}", exc_info=True)
 
-    job_root = job.job_dir.resolve()
-    to_remove: list[Path] = []
+    # 任务目录本身不含符号链接时，用 abspath 做前缀比较即可（无需逐级 lstat）
+    job_root = os.path.abspath(job.job_dir)
+    normalize = os.path.abspath
+    real_root = os.path.realpath(job_root)
+    if real_root != job_root:
+        job_root, normalize = real_root, os.path.realpath
+    job_prefix = job_root + os.sep
+    # 不存在的文件由 _safe_unlink 忽略，无需预先 exists()
+    to_remove: list[str] = []
 
     ref_path = job.get_reference_path()
-    if ref_path and ref_path.exists():
-        try:
-            if ref_path.resolve().is_relative_to(job_root):
-                to_remove.append(ref_path)
-        except Exception:
-            pass
+    if ref_path and normalize(ref_path).startswith(job_prefix):
+        to_remove.append(os.fspath(ref_path))
 
     for vid in job.metadata.encoded_videos or []:
-        p = Path(vid.filename)
-        if not p.is_absolute():
-            p = job.job_dir / p
-        if p.exists():
-            try:
-                if p.resolve().is_relative_to(job_root):
-                    to_remove.append(p)
-            except Exception:
-                pass
+        p = os.path.join(job.job_dir, vid.filename)
+        if normalize(p).startswith(job_prefix):
+            to_remove.append(p)
 
     for item in to_remove:
         _safe_unlink(item)
@@ -416,8 +496,14 @@ class StreamAnalysisRunner:
     def __init__(self) -> None:
         """初始化任务处理器"""
         self.processing = False
-        self.current_job: Optional[str] = None
+        self.current_jobs: Set[str] = set()
         self.supported_modes = {JobMode.BITSTREAM_ANALYSIS}
+        # 并发上限：避免无限制地拉起 ffmpeg 子进程
+        self.max_parallel = settings.max_parallel_jobs or max(1, (os.cpu_count() or 1) // 4)
+        self._sem = asyncio.Semaphore(self.max_parallel)
+        self._inflight: Set[asyncio.Task] = set()
+        # 新任务提交时唤醒后台处理器
+        self.wakeup = asyncio.Event()
 
     async def process_job(self, job_id: str) -> None:
         """
@@ -441,7 +527,6 @@ class StreamAnalysisRunner:
         try:
             # 更新状态为处理中
             job.metadata.status = JobStatus.PROCESSING
-            job.metadata.updated_at = _now_tz()
             job_storage.update_job(job)
 
             logger.info(f"Processing job {job_id} (mode: {job.metadata.mode})")
@@ -450,10 +535,9 @@ class StreamAnalysisRunner:
             if job.metadata.mode == JobMode.BITSTREAM_ANALYSIS:
                 await self._process_stream_analysis(job)
 
-            # 更新状态为已完成
+            # 更新状态为已完成（连同 execution_result 与尚未落盘的命令日志一次写入）
             job.metadata.status = JobStatus.COMPLETED
             job.metadata.completed_at = _now_tz()
-            job.metadata.updated_at = _now_tz()
             job_storage.update_job(job)
 
             logger.info(f"Job {job_id} completed successfully")
@@ -462,7 +546,6 @@ class StreamAnalysisRunner:
             # 更新状态为失败
             job.metadata.status = JobStatus.FAILED
             job.metadata.error_message = str(e)
-            job.metadata.updated_at = _now_tz()
             job_storage.update_job(job)
 
             logger.error(f"Job {job_id} failed: {str(e)}")
@@ -486,43 +569,76 @@ class StreamAnalysisRunner:
 
         report_path = job.job_dir / report_rel_path
         report_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(report_path, "w", encoding="utf-8") as f:
-            json.dump(report_data, f, ensure_ascii=False)
+        # 逐帧报告较大：序列化与写盘放到线程中，避免阻塞事件循环
+        await asyncio.to_thread(_write_json, report_path, report_data)
+        # 逐帧数据已落盘，尽早释放
+        del report_data
 
+        # 由 process_job 在写入完成状态时一并落盘
         job.metadata.execution_result = summary
-        job_storage.update_job(job)
+
+    async def _process_job_with_slot(self, job_id: str) -> None:
+        """在已占用的并发槽位中处理任务，结束后释放槽位"""
+        try:
+            await self.process_job(job_id)
+        finally:
+            self.current_jobs.discard(job_id)
+            self._sem.release()
 
     async def start_background_processor(self) -> None:
-        """启动后台处理器（轮询待处理任务）"""
+        """启动后台处理器（轮询待处理任务，最多并发 max_parallel 个）"""
         from .storage import job_storage
 
         self.processing = True
-        logger.info("Background Stream Analysis processor started")
+        logger.info(f"Background Stream Analysis processor started (max_parallel={self.max_parallel})")
 
         while self.processing:
+            # 扫描前清除唤醒标记：扫描能看到此前提交的任务，之后的提交会重新唤醒
+            self.wakeup.clear()
             try:
-                # 查找待处理的任务
-                pending_jobs = job_storage.list_jobs(status=JobStatus.PENDING, limit=20)
-                job_to_process = next(
-                    (j for j in pending_jobs if j.metadata.mode in self.supported_modes),
-                    None,
+                # 查找待处理的任务（跳过已在处理中的任务）
+                pending_jobs = job_storage.list_jobs(
+                    status=JobStatus.PENDING,
+                    limit=20,
+                    modes=self.supported_modes,
                 )
-
-                if job_to_process:
-                    self.current_job = job_to_process.job_id
-                    await self.process_job(job_to_process.job_id)
-                    self.current_job = None
-                else:
-                    # 没有待处理任务，等待一会儿
-                    await asyncio.sleep(5)
+                jobs_to_process = [j for j in pending_jobs if j.job_id not in self.current_jobs]
+
+                if not jobs_to_process:
+                    # 没有待处理任务，等待新任务提交（超时后兜底重新扫描）
+                    try:
+                        await asyncio.wait_for(self.wakeup.wait(), timeout=30)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                for job in jobs_to_process:
+                    # 等待空闲槽位
+                    await self._sem.acquire()
+                    if not self.processing:
+                        self._sem.release()
+                        break
+                    self.current_jobs.add(job.job_id)
+                    task = asyncio.create_task(self._process_job_with_slot(job.job_id))
+                    self._inflight.add(task)
+                    task.add_done_callback(self._inflight.discard)
 
             except Exception as e:
                 logger.error(f"Error in background processor: {str(e)}")
                 await asyncio.sleep(5)
 
+        # 等待正在处理的任务结束
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+    def notify_job_submitted(self) -> None:
+        """通知后台处理器有新任务提交"""
+        self.wakeup.set()
+
     def stop_background_processor(self) -> None:
         """停止后台处理器"""
         self.processing = False
+        self.wakeup.set()
         logger.info("Background Stream Analysis processor stopped")
 
 
@@ -3,9 +3,11 @@
 
 被 template_runner.py 和 metrics_analysis_runner.py 共用
 """
+import re
 import shlex
 from dataclasses import dataclass
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple, Union
 
@@ -36,6 +38,17 @@ def list_sources(source_dir: Path) -> List[Path]:
     return sorted([p for p in source_dir.iterdir() if p.is_file()])
 
 
+_YUV_NAME_RE = re.compile(r"_([0-9]+)x([0-9]+)_([0-9]+(?:\.[0-9]+)?)$")
+
+
+@lru_cache(maxsize=1024)
+def _parse_yuv_stem(stem: str) -> Optional[Tuple[int, int, float]]:
+    m = _YUV_NAME_RE.search(stem)
+    if not m:
+        return None
+    return int(m.group(1)), int(m.group(2)), float(m.group(3))
+
+
 def parse_yuv_name(path: Path) -> Tuple[int, int, float]:
     """
     解析 YUV 文件名获取分辨率和帧率
@@ -43,12 +56,10 @@ def parse_yuv_name(path: Path) -> Tuple[int, int, float]:
     文件名格式: name_WxH_FPS.yuv
     例如: video_1920x1080_30.yuv
     """
-    import re
-    stem = path.stem
-    m = re.search(r"_([0-9]+)x([0-9]+)_([0-9]+(?:\.[0-9]+)?)$", stem)
-    if not m:
+    parsed = _parse_yuv_stem(path.stem)
+    if parsed is None:
         raise ValueError(f"YUV 文件名不符合格式: {path.name}")
-    return int(m.group(1)), int(m.group(2)), float(m.group(3))
+    return parsed
 
 
 async def probe_media(path: Path) -> Tuple[int, int, float]:
@@ -270,21 +281,21 @@ def build_encode_cmd(
     return pipeline_cmd, out_width, out_height, out_fps
 
 
-def start_command(job, command_type: str, command: List[str], source_file: Optional[str], storage) -> Optional[CommandLog]:
+def start_command(job, command_type: str, command: Union[List[str], str], source_file: Optional[str], storage) -> Optional[CommandLog]:
     """记录命令开始执行"""
     if not job:
         return None
     log = CommandLog(
         command_id=f"{len(job.metadata.command_logs)+1}",
         command_type=command_type,
-        command=" ".join(command),
+        command=command if isinstance(command, str) else " ".join(command),
         status=CommandStatus.RUNNING,
         source_file=str(source_file) if source_file else None,
         started_at=now(),
     )
     job.metadata.command_logs.append(log)
     try:
-        storage.update_job(job)
+        storage.update_job_debounced(job)
     except Exception:
         pass
     return log
@@ -299,7 +310,7 @@ def finish_command(job, log: Optional[CommandLog], status: CommandStatus, storag
     if error:
         log.error_message = error
     try:
-        storage.update_job(job)
+        storage.update_job_debounced(job)
     except Exception:
         pass
 
@@ -2,15 +2,22 @@
 性能监控工具模块
 """
 import asyncio
+import os
 import re
+import sys
 import time
+from array import array
+from collections import deque
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
 
 import psutil
 
 from src.models.template import EncoderType
 
+# cpu_samples 保留的最大点数：达到上限后相邻两点合并、采样间隔加倍，长时间编码的报告体积有界
+_MAX_CPU_SAMPLES = 1024
+
 
 @dataclass
 class PerformanceData:
@@ -20,7 +27,49 @@ class PerformanceData:
     total_frames: Optional[int] = None
     cpu_avg_percent: Optional[float] = None
     cpu_max_percent: Optional[float] = None
-    cpu_samples: List[float] = field(default_factory=list)
+    # 紧凑存储的 float32 序列，仅在 to_dict 时转换为列表
+    cpu_samples: array = field(default_factory=lambda: array("f"))
+    # cpu_samples 相邻两点的时间间隔（毫秒）
+    cpu_sample_interval_ms: int = 100
+    # 全部原始采样的累计值，用于计算精确均值（cpu_samples 可能已被降采样）
+    _cpu_total: float = field(default=0.0, init=False, repr=False)
+    _cpu_count: int = field(default=0, init=False, repr=False)
+    # 尚未凑满一个存储间隔的原始采样（降采样后原始采样比存储间隔更密）
+    _pending_total: float = field(default=0.0, init=False, repr=False)
+    _pending_count: int = field(default=0, init=False, repr=False)
+
+    def add_sample(self, value: float, interval_ms: Optional[int] = None) -> None:
+        """
+        追加一个 CPU 采样，同时更新均值与峰值
+
+        Args:
+            value: CPU 占用率
+            interval_ms: 原始采样间隔（毫秒），默认与 cpu_sample_interval_ms 相同；
+                小于存储间隔时先累积，凑满一个存储间隔再取平均写入，序列保持等间隔
+        """
+        self._cpu_total += value
+        self._cpu_count += 1
+        self.cpu_avg_percent = self._cpu_total / self._cpu_count
+        if self.cpu_max_percent is None or value > self.cpu_max_percent:
+            self.cpu_max_percent = value
+
+        self._pending_total += value
+        self._pending_count += 1
+        step = max(1, self.cpu_sample_interval_ms // (interval_ms or self.cpu_sample_interval_ms))
+        if self._pending_count < step:
+            return
+        self.cpu_samples.append(self._pending_total / self._pending_count)
+        self._pending_total = 0.0
+        self._pending_count = 0
+        if len(self.cpu_samples) >= _MAX_CPU_SAMPLES:
+            self.decimate(2)
+
+    def decimate(self, factor: int) -> None:
+        """每 factor 个采样取平均合并为一个，采样间隔相应放大，序列保持等间隔"""
+        samples = self.cpu_samples
+        chunks = (samples[i:i + factor] for i in range(0, len(samples), factor))
+        self.cpu_samples = array("f", [sum(chunk) / len(chunk) for chunk in chunks])
+        self.cpu_sample_interval_ms *= factor
 
     def to_dict(self) -> Dict[str, Any]:
         result: Dict[str, Any] = {}
@@ -36,115 +85,406 @@ class PerformanceData:
             result["cpu_max_percent"] = round(self.cpu_max_percent, 2)
         if self.cpu_samples:
             result["cpu_samples"] = [round(s, 2) for s in self.cpu_samples]
+            result["cpu_sample_interval_ms"] = self.cpu_sample_interval_ms
         return result
 
 
-def parse_encoder_output(stderr: str, encoder_type: EncoderType) -> Tuple[Optional[int], Optional[float], Optional[float]]:
+_FFMPEG_RE = re.compile(rb"frame=\s*(\d+).*?fps=\s*([\d.]+).*?elapsed=(\d+):(\d+):([\d.]+)")
+_X264_RE = re.compile(rb"encoded\s+(\d+)\s+frames,\s+([\d.]+)\s+fps")
+_X265_RE = re.compile(rb"encoded\s+(\d+)\s+frames\s+in\s+([\d.]+)s\s+\(([\d.]+)\s+fps\)")
+# vvenc 汇总行拆为三段独立匹配：先定位 "Total Time:"，其余字段从该位置向后查找，避免 .*? 回溯
+_VVENC_RE = re.compile(rb"Total Time:\s+([\d.]+)\s+sec")
+_VVENC_FPS_RE = re.compile(rb"Fps\(avg\):\s+([\d.]+)")
+_VVENC_FRAMES_RE = re.compile(rb"encoded Frames\s+(\d+)")
+
+
+def _parse_ffmpeg(m: "re.Match[bytes]") -> Tuple[Optional[int], Optional[float], Optional[float]]:
+    total_time = int(m.group(3)) * 3600 + int(m.group(4)) * 60 + float(m.group(5))
+    return int(m.group(1)), float(m.group(2)), total_time
+
+
+def _parse_x264(m: "re.Match[bytes]") -> Tuple[Optional[int], Optional[float], Optional[float]]:
+    return int(m.group(1)), float(m.group(2)), None
+
+
+def _parse_x265(m: "re.Match[bytes]") -> Tuple[Optional[int], Optional[float], Optional[float]]:
+    return int(m.group(1)), float(m.group(3)), float(m.group(2))
+
+
+def _parse_vvenc(m: "re.Match[bytes]") -> Tuple[Optional[int], Optional[float], Optional[float]]:
+    fps_m = _VVENC_FPS_RE.search(m.string, m.end())
+    if fps_m is None:
+        return None, None, None
+    frames_m = _VVENC_FRAMES_RE.search(m.string, fps_m.end())
+    if frames_m is None:
+        return None, None, None
+    return int(frames_m.group(1)), float(fps_m.group(1)), float(m.group(1))
+
+
+# 编码器类型 -> (正则, 结果解析函数, 优先扫描的尾部长度, 逐行预筛选关键字, 正则的字面量前缀)
+_ENCODER_PATTERNS = {
+    EncoderType.FFMPEG: (_FFMPEG_RE, _parse_ffmpeg, 65536, b"elapsed=", b"frame="),
+    EncoderType.X264: (_X264_RE, _parse_x264, 8192, b"encoded", b"encoded"),
+    EncoderType.X265: (_X265_RE, _parse_x265, 8192, b"encoded", b"encoded"),
+    EncoderType.VVENC: (_VVENC_RE, _parse_vvenc, 8192, b"Total Time:", b"Total Time:"),
+}
+
+
+def _last_match(
+    pattern: "re.Pattern[bytes]",
+    text: bytes,
+    tail: int,
+    prefix: bytes,
+) -> Optional["re.Match[bytes]"]:
+    """
+    返回最后一个匹配
+
+    先用 rfind 定位最后一次出现的字面量前缀并在该处锚定匹配；
+    最后一行不完整时再依次扫描尾部、全文。
+    """
+    idx = text.rfind(prefix)
+    if idx == -1:
+        return None
+    m = pattern.match(text, idx)
+    if m is not None:
+        return m
+    chunks = (text[-tail:], text) if len(text) > tail else (text,)
+    for chunk in chunks:
+        last = None
+        for last in pattern.finditer(chunk):
+            pass
+        if last is not None:
+            return last
+    return None
+
+
+# 编码器 stderr 逐块读取：进度行以 \r 或 \n 分隔，仅保留最近若干行
+_LINE_SPLIT_RE = re.compile(rb"[\r\n]")
+_PIPE_READ_SIZE = 1 << 16
+_STDERR_TAIL_LINES = 64
+
+
+def parse_encoder_output(
+    stderr: Union[bytes, str],
+    encoder_type: EncoderType,
+) -> Tuple[Optional[int], Optional[float], Optional[float]]:
     """
     解析编码器输出，提取帧数、FPS、总时间
     返回: (frames, fps, total_time_s)
+
+    直接在 bytes 上匹配，仅捕获组参与数值转换，无需解码整个输出。
+    """
+    if isinstance(stderr, str):
+        stderr = stderr.encode(errors="ignore")
+
+    entry = _ENCODER_PATTERNS.get(encoder_type)
+    if entry is None:
+        return None, None, None
+
+    pattern, parse, tail, _, prefix = entry
+    m = _last_match(pattern, stderr, tail, prefix)
+    if m is None:
+        return None, None, None
+    return parse(m)
+
+
+# 子进程列表刷新间隔（秒）：编码器启动后子进程结构基本稳定
+_CHILDREN_REFRESH_INTERVAL = 2.0
+# 采样间隔（秒）：前 _FAST_SAMPLE_WINDOW 秒密集采样，之后放缓
+_FAST_SAMPLE_INTERVAL = 0.1
+_SLOW_SAMPLE_INTERVAL = 0.5
+_FAST_SAMPLE_WINDOW = 5.0
+# 切换到慢速采样时，每多少个快速采样点合并为一个
+_SLOW_SAMPLE_RATIO = round(_SLOW_SAMPLE_INTERVAL / _FAST_SAMPLE_INTERVAL)
+
+# Linux 下直接读取 /proc/<pid>/stat 计算进程树 CPU，绕过 psutil 的逐进程开销
+_USE_PROC_STAT = sys.platform.startswith("linux") and os.path.exists("/proc/self/stat")
+_CLK_TCK = os.sysconf("SC_CLK_TCK") if _USE_PROC_STAT else 100
+# 内核开启 CONFIG_PROC_CHILDREN 时可直接经 /proc 枚举子进程，不再构造 psutil.Process
+_USE_PROC_CHILDREN = _USE_PROC_STAT and os.path.exists(f"/proc/self/task/{os.getpid()}/children")
+
+
+def _read_proc_cpu_ticks(pid: int) -> Optional[int]:
+    """读取进程累计 CPU 时间（utime + stime，单位 clock tick），进程不存在时返回 None"""
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    # 进程名可能包含空格/括号：从最后一个 ')' 之后开始切分，字段 14/15 为 utime/stime
+    fields = data.rsplit(b")", 1)[1].split()
+    return int(fields[11]) + int(fields[12])
+
+
+def _walk_proc_tree(root_pid: int) -> List[int]:
+    """经 /proc/<pid>/task/<tid>/children 广度优先枚举进程树，返回父进程在前的 pid 列表"""
+    pids = [root_pid]
+    queue: Deque[int] = deque(pids)
+    while queue:
+        pid = queue.popleft()
+        try:
+            tids = os.listdir(f"/proc/{pid}/task")
+        except OSError:
+            continue
+        for tid in tids:
+            try:
+                with open(f"/proc/{pid}/task/{tid}/children", "rb") as f:
+                    data = f.read()
+            except OSError:
+                continue
+            for child in data.split():
+                child_pid = int(child)
+                pids.append(child_pid)
+                queue.append(child_pid)
+    return pids
+
+
+def _proc_tree_cpu(pids: List[int], prev_ticks: Dict[int, int], elapsed: float) -> Optional[float]:
+    """
+    根据两次 /proc 读数之差计算进程树 CPU 占用率（100 表示占满一个核）
+
+    Args:
+        pids: 父进程在前的进程列表
+        prev_ticks: 上次读数（pid -> ticks），原地更新
+        elapsed: 距上次读数的时间（秒）
+
+    Returns:
+        CPU 占用率；父进程已退出时返回 None
+    """
+    delta = 0
+    for index, pid in enumerate(pids):
+        ticks = _read_proc_cpu_ticks(pid)
+        if ticks is None:
+            if index == 0:
+                return None
+            prev_ticks.pop(pid, None)
+            continue
+        previous = prev_ticks.get(pid)
+        if previous is not None:
+            delta += ticks - previous
+        prev_ticks[pid] = ticks
+    if elapsed <= 0:
+        return 0.0
+    return delta / _CLK_TCK / elapsed * 100
+
+
+def get_process_tree_cpu(proc: psutil.Process, children: Optional[Dict[int, psutil.Process]] = None) -> float:
+    """
+    获取进程树（父进程+所有子进程）的CPU占用率总和
+
+    Args:
+        proc: 父进程
+        children: 缓存的子进程（pid -> Process），已退出的会被移除；为 None 时实时枚举
     """
-    frames: Optional[int] = None
-    fps: Optional[float] = None
-    total_time: Optional[float] = None
-
-    if encoder_type == EncoderType.FFMPEG:
-        matches = re.findall(r"frame=\s*(\d+).*?fps=\s*([\d.]+).*?elapsed=(\d+):(\d+):([\d.]+)", stderr)
-        if matches:
-            last_match = matches[-1]
-            frames = int(last_match[0])
-            fps = float(last_match[1])
-            hours = int(last_match[2])
-            minutes = int(last_match[3])
-            seconds = float(last_match[4])
-            total_time = hours * 3600 + minutes * 60 + seconds
-    elif encoder_type == EncoderType.X264:
-        m = re.search(r"encoded\s+(\d+)\s+frames,\s+([\d.]+)\s+fps", stderr)
-        if m:
-            frames = int(m.group(1))
-            fps = float(m.group(2))
-    elif encoder_type == EncoderType.X265:
-        m = re.search(r"encoded\s+(\d+)\s+frames\s+in\s+([\d.]+)s\s+\(([\d.]+)\s+fps\)", stderr)
-        if m:
-            frames = int(m.group(1))
-            total_time = float(m.group(2))
-            fps = float(m.group(3))
-    elif encoder_type == EncoderType.VVENC:
-        m = re.search(r"Total Time:\s+([\d.]+)\s+sec.*?Fps\(avg\):\s+([\d.]+).*?encoded Frames\s+(\d+)", stderr)
-        if m:
-            total_time = float(m.group(1))
-            fps = float(m.group(2))
-            frames = int(m.group(3))
-
-    return frames, fps, total_time
-
-
-def get_process_tree_cpu(proc: psutil.Process) -> float:
-    """获取进程树（父进程+所有子进程）的CPU占用率总和"""
     total_cpu = 0.0
     try:
-        total_cpu += proc.cpu_percent(interval=None)
-        for child in proc.children(recursive=True):
+        # oneshot 内对同一进程的多次读取共用一次 /proc 读取结果
+        with proc.oneshot():
+            total_cpu += proc.cpu_percent(interval=None)
+        if children is None:
+            children = {child.pid: child for child in proc.children(recursive=True)}
+        for pid, child in list(children.items()):
             try:
-                total_cpu += child.cpu_percent(interval=None)
+                with child.oneshot():
+                    total_cpu += child.cpu_percent(interval=None)
             except (psutil.NoSuchProcess, psutil.AccessDenied):
-                pass
+                children.pop(pid, None)
     except (psutil.NoSuchProcess, psutil.AccessDenied):
         pass
     return total_cpu
 
 
-async def sample_cpu(pid: int, samples: List[float], stop_event: asyncio.Event) -> None:
-    """后台协程：每100ms采样一次CPU占用率"""
+def _refresh_children(proc: psutil.Process, children: Dict[int, psutil.Process], prime: bool = True) -> None:
+    """重新枚举子进程，保留已有的 Process 对象（其中保存了 cpu_percent 的上次读数）"""
+    current: Dict[int, psutil.Process] = {}
+    for child in proc.children(recursive=True):
+        existing = children.get(child.pid)
+        if existing is not None:
+            current[child.pid] = existing
+            continue
+        if prime:
+            try:
+                child.cpu_percent(interval=None)  # 首次调用仅建立基准
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        current[child.pid] = child
+    children.clear()
+    children.update(current)
+
+
+async def sample_cpu(pid: int, perf: PerformanceData, stop_event: asyncio.Event) -> None:
+    """
+    后台协程：前5秒每100ms、之后每500ms采样一次CPU占用率，stop_event 置位后立即退出
+
+    采样经 perf.add_sample 写入，均值与峰值随采样实时更新。
+    切换到慢速采样时，已有的快速采样按组取平均降采样，保证整条序列间隔一致
+    （间隔记录在 perf.cpu_sample_interval_ms），图表时间轴因此不失真。
+    """
     cpu_count = psutil.cpu_count() or 1
+    loop = asyncio.get_running_loop()
+    children: Dict[int, psutil.Process] = {}
+    prev_ticks: Dict[int, int] = {}
+    perf.cpu_sample_interval_ms = round(_FAST_SAMPLE_INTERVAL * 1000)
     try:
-        proc = psutil.Process(pid)
-        get_process_tree_cpu(proc)
-        await asyncio.sleep(0.1)
+        proc = None if _USE_PROC_CHILDREN else psutil.Process(pid)
+
+        def refresh_tree() -> List[int]:
+            if _USE_PROC_CHILDREN:
+                return _walk_proc_tree(pid)
+            _refresh_children(proc, children, prime=not _USE_PROC_STAT)
+            return [pid, *children]
 
-        while not stop_event.is_set():
+        pids = refresh_tree()
+        if _USE_PROC_STAT:
+            _proc_tree_cpu(pids, prev_ticks, 0.0)
+        else:
+            proc.cpu_percent(interval=None)
+        last_refresh = last_sample = loop.time()
+
+        # 按绝对截止时间采样，避免采样耗时累积造成漂移
+        start = deadline = loop.time()
+        interval = _FAST_SAMPLE_INTERVAL
+        while True:
+            if interval == _FAST_SAMPLE_INTERVAL and deadline - start >= _FAST_SAMPLE_WINDOW:
+                interval = _SLOW_SAMPLE_INTERVAL
+                perf.decimate(_SLOW_SAMPLE_RATIO)
+            deadline += interval
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=max(0.0, deadline - loop.time()))
+                break
+            except asyncio.TimeoutError:
+                pass
             try:
-                raw_cpu = get_process_tree_cpu(proc)
-                normalized = raw_cpu / cpu_count
-                samples.append(normalized)
+                if loop.time() - last_refresh >= _CHILDREN_REFRESH_INTERVAL:
+                    pids = refresh_tree()
+                    last_refresh = loop.time()
+                if _USE_PROC_STAT:
+                    now = loop.time()
+                    raw_cpu = _proc_tree_cpu(pids, prev_ticks, now - last_sample)
+                    last_sample = now
+                    if raw_cpu is None:
+                        break
+                else:
+                    raw_cpu = get_process_tree_cpu(proc, children)
+                perf.add_sample(raw_cpu / cpu_count, round(interval * 1000))
             except (psutil.NoSuchProcess, psutil.AccessDenied):
                 break
-            await asyncio.sleep(0.1)
     except (psutil.NoSuchProcess, psutil.AccessDenied):
         pass
 
 
+async def _drain_stderr(
+    stream: asyncio.StreamReader,
+    encoder_type: EncoderType,
+) -> Tuple[bytes, Tuple[Optional[int], Optional[float], Optional[float]]]:
+    """
+    逐行读取编码器 stderr 并增量匹配统计信息
+
+    返回: (最近若干行 stderr, (frames, fps, total_time_s))
+    """
+    entry = _ENCODER_PATTERNS.get(encoder_type)
+    pattern, parse, _, keyword, _ = entry if entry is not None else (None, None, 0, b"", b"")
+    recent: Deque[bytes] = deque(maxlen=_STDERR_TAIL_LINES)
+    last_match: Optional["re.Match[bytes]"] = None
+
+    def handle_line(line: bytes) -> None:
+        nonlocal last_match
+        if not line:
+            return
+        recent.append(line)
+        # 先用子串查找排除绝大多数无关行，仅对候选行执行正则
+        if pattern is not None and keyword in line:
+            m = pattern.search(line)
+            if m:
+                last_match = m
+
+    pending = b""
+    while True:
+        chunk = await stream.read(_PIPE_READ_SIZE)
+        if not chunk:
+            break
+        lines = _LINE_SPLIT_RE.split(pending + chunk)
+        pending = lines.pop()
+        for line in lines:
+            handle_line(line)
+    handle_line(pending)
+
+    parsed = parse(last_match) if last_match is not None else (None, None, None)
+    return b"\n".join(recent), parsed
+
+
+def install_child_watcher() -> None:
+    """
+    在 Linux + Python 3.12 以下改用 pidfd 监听子进程退出
+
+    默认的 ThreadedChildWatcher 为每个子进程启动一个等待线程；3.12 起 asyncio 已默认使用 pidfd。
+    需在事件循环运行后调用。
+    """
+    if sys.version_info >= (3, 12) or not sys.platform.startswith("linux"):
+        return
+    try:
+        os.close(os.pidfd_open(os.getpid()))
+        watcher = asyncio.PidfdChildWatcher()
+        watcher.attach_loop(asyncio.get_running_loop())
+        asyncio.set_child_watcher(watcher)
+    except (AttributeError, OSError, NotImplementedError, RuntimeError):
+        # 内核不支持 pidfd 或事件循环策略不支持 child watcher（如 uvloop）
+        return
+
+
+def _encoder_writes_to_stdout(cmd: Union[List[str], str]) -> bool:
+    """
+    判断编码命令是否把码流写到 stdout
+
+    管道命令字符串中末尾的 "-" 是编码器的 stdin，码流由 -o 写入文件。
+    """
+    if isinstance(cmd, str):
+        return False
+    return bool(cmd) and cmd[-1] in ("-", "pipe:", "pipe:1")
+
+
 async def run_encode_with_perf(
-    cmd: List[str],
+    cmd: Union[List[str], str],
     encoder_type: EncoderType,
 ) -> Tuple[int, bytes, bytes, PerformanceData]:
     """
     运行编码命令并采集性能数据
     返回: (returncode, stdout, stderr, performance_data)
+
+    cmd 为字符串时按管道命令经 shell 执行。输出写入文件时不捕获 stdout（返回 b""）；
+    stderr 仅包含最近若干行输出（足以用于错误信息）。
     """
     perf = PerformanceData()
-    cpu_samples: List[float] = []
     stop_event = asyncio.Event()
 
-    proc = await asyncio.create_subprocess_exec(
-        *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
-    )
+    capture_stdout = _encoder_writes_to_stdout(cmd)
+    stdout_sink = asyncio.subprocess.PIPE if capture_stdout else asyncio.subprocess.DEVNULL
+    if isinstance(cmd, str):
+        proc = await asyncio.create_subprocess_shell(
+            cmd, stdout=stdout_sink, stderr=asyncio.subprocess.PIPE
+        )
+    else:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, stdout=stdout_sink, stderr=asyncio.subprocess.PIPE
+        )
 
-    sample_task = asyncio.create_task(sample_cpu(proc.pid, cpu_samples, stop_event))
-    start_time = time.time()
-    stdout, stderr = await proc.communicate()
-    end_time = time.time()
+    sample_task = asyncio.create_task(sample_cpu(proc.pid, perf, stop_event))
+    start_time = time.monotonic()
+    if capture_stdout:
+        stdout, (stderr, parsed) = await asyncio.gather(
+            proc.stdout.read(),
+            _drain_stderr(proc.stderr, encoder_type),
+        )
+    else:
+        stdout = b""
+        stderr, parsed = await _drain_stderr(proc.stderr, encoder_type)
+    await proc.wait()
+    end_time = time.monotonic()
 
     stop_event.set()
     await sample_task
 
-    perf.cpu_samples = cpu_samples
-    if cpu_samples:
-        perf.cpu_avg_percent = sum(cpu_samples) / len(cpu_samples)
-        perf.cpu_max_percent = max(cpu_samples)
-
-    stderr_str = stderr.decode(errors="ignore")
-    frames, fps, total_time = parse_encoder_output(stderr_str, encoder_type)
+    frames, fps, total_time = parsed
 
     if frames is not None:
         perf.total_frames = frames
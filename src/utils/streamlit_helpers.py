@@ -8,6 +8,7 @@ import sys
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import streamlit as st
@@ -153,44 +154,64 @@ def parse_rate_point(label: str) -> tuple[Optional[str], Optional[float]]:
 
 # ========== CPU 图表相关 ==========
 
-def aggregate_cpu_samples(samples: List[float], interval_ms: int) -> Tuple[List[float], List[float]]:
+def aggregate_cpu_samples(
+    samples: np.ndarray,
+    interval_ms: int,
+    sample_interval_ms: int = 100,
+) -> Tuple[np.ndarray, np.ndarray]:
     """
     聚合 CPU 采样数据
 
     Args:
-        samples: CPU 采样数据列表（原始采样间隔为 100ms）
+        samples: CPU 采样数据（float32 数组，列表也可）
         interval_ms: 聚合间隔（毫秒）
+        sample_interval_ms: 原始采样间隔（毫秒），默认 100ms
 
     Returns:
-        (x_values, y_values) 元组，x 为时间（秒），y 为 CPU 占用率
+        (x_values, y_values) 数组元组，x 为时间（秒），y 为 CPU 占用率
     """
-    if not samples:
-        return [], []
-    # 原始采样间隔为100ms
-    step = interval_ms // 100
+    samples = np.asarray(samples, dtype=np.float32)
+    if samples.size == 0:
+        return np.empty(0), samples
+    sample_interval_ms = sample_interval_ms or 100
+    step = interval_ms // sample_interval_ms
     if step <= 1:
         # 不聚合
-        x = [i * 0.1 for i in range(len(samples))]
-        return x, samples
-    # 聚合
-    agg_samples = []
-    for i in range(0, len(samples), step):
-        chunk = samples[i:i+step]
-        if chunk:
-            agg_samples.append(sum(chunk) / len(chunk))
-    x = [i * (interval_ms / 1000) for i in range(len(agg_samples))]
-    return x, agg_samples
+        return np.arange(samples.size) * (sample_interval_ms / 1000), samples
+    # 聚合：整组 reshape 后按行求均值，末尾不足一组的样本单独成组
+    full = samples.size - samples.size % step
+    agg_samples = samples[:full].reshape(-1, step).mean(axis=1)
+    if full < samples.size:
+        agg_samples = np.append(agg_samples, samples[full:].mean())
+    return np.arange(agg_samples.size) * (step * sample_interval_ms / 1000), agg_samples
+
+
+def _cpu_peak_trace(x: np.ndarray, y: np.ndarray, color: str, name: str) -> go.Scatter:
+    """CPU 曲线最大值的星标注：argmax 单次遍历定位峰值，y 不能为空"""
+    max_idx = int(y.argmax())
+    max_val = float(y[max_idx])
+    return go.Scatter(
+        x=[x[max_idx]], y=[max_val],
+        mode="markers+text",
+        name=name,
+        marker=dict(color=color, size=12, symbol="star"),
+        text=[f"Max: {max_val:.1f}%"],
+        textposition="top center",
+        showlegend=False,
+    )
 
 
 def create_cpu_chart(
-    anchor_samples: List[float],
-    test_samples: List[float],
+    anchor_samples: np.ndarray,
+    test_samples: np.ndarray,
     agg_interval: int,
     title: str,
     anchor_label: str = "Anchor",
     test_label: str = "Test",
     anchor_color: str = "#636efa",
     test_color: str = "#f0553b",
+    anchor_sample_interval_ms: int = 100,
+    test_sample_interval_ms: int = 100,
 ) -> go.Figure:
     """
     创建 CPU 占用率对比图表
@@ -204,54 +225,38 @@ def create_cpu_chart(
         test_label: 实验组标签
         anchor_color: 基准组颜色
         test_color: 实验组颜色
+        anchor_sample_interval_ms: 基准组原始采样间隔（毫秒）
+        test_sample_interval_ms: 实验组原始采样间隔（毫秒）
 
     Returns:
         Plotly Figure 对象
     """
-    anchor_x, anchor_y = aggregate_cpu_samples(anchor_samples, agg_interval)
-    test_x, test_y = aggregate_cpu_samples(test_samples, agg_interval)
+    anchor_x, anchor_y = aggregate_cpu_samples(anchor_samples, agg_interval, anchor_sample_interval_ms)
+    test_x, test_y = aggregate_cpu_samples(test_samples, agg_interval, test_sample_interval_ms)
 
     fig = go.Figure()
 
     # 基准组折线
-    if anchor_y:
-        fig.add_trace(go.Scatter(
+    if anchor_y.size:
+        fig.add_trace(go.Scattergl(
             x=anchor_x, y=anchor_y,
             mode="lines",
             name=anchor_label,
             line=dict(color=anchor_color, width=2),
         ))
         # 标记最大值
-        max_idx = anchor_y.index(max(anchor_y))
-        fig.add_trace(go.Scatter(
-            x=[anchor_x[max_idx]], y=[anchor_y[max_idx]],
-            mode="markers+text",
-            name=f"{anchor_label} Max",
-            marker=dict(color=anchor_color, size=12, symbol="star"),
-            text=[f"Max: {anchor_y[max_idx]:.1f}%"],
-            textposition="top center",
-            showlegend=False,
-        ))
+        fig.add_trace(_cpu_peak_trace(anchor_x, anchor_y, anchor_color, f"{anchor_label} Max"))
 
     # 实验组折线
-    if test_y:
-        fig.add_trace(go.Scatter(
+    if test_y.size:
+        fig.add_trace(go.Scattergl(
             x=test_x, y=test_y,
             mode="lines",
             name=test_label,
             line=dict(color=test_color, width=2),
         ))
         # 标记最大值
-        max_idx = test_y.index(max(test_y))
-        fig.add_trace(go.Scatter(
-            x=[test_x[max_idx]], y=[test_y[max_idx]],
-            mode="markers+text",
-            name=f"{test_label} Max",
-            marker=dict(color=test_color, size=12, symbol="star"),
-            text=[f"Max: {test_y[max_idx]:.1f}%"],
-            textposition="top center",
-            showlegend=False,
-        ))
+        fig.add_trace(_cpu_peak_trace(test_x, test_y, test_color, f"{test_label} Max"))
 
     fig.update_layout(
         title=title,
@@ -264,6 +269,11 @@ def create_cpu_chart(
     return fig
 
 
+def video_point_labels(df: "pd.DataFrame") -> "pd.Series":
+    """生成 "Video_Point" 形式的 x 轴标签（str.cat 一次拼接，不再两次 + 产生中间 Series）"""
+    return df["Video"].astype(str).str.cat(df["Point"].astype(str), sep="_")
+
+
 def create_fps_chart(
     df_perf: "pd.DataFrame",
     anchor_label: str = "Anchor",
@@ -284,11 +294,11 @@ def create_fps_chart(
     Returns:
         Plotly Figure 对象
     """
-    # 按 Video 和 Point 排序
-    df_sorted = df_perf.sort_values(by=["Video", "Point"])
+    # 按 Video 和 Point 排序（只带绘图用到的列）
+    df_sorted = df_perf[["Video", "Point", "Side", "FPS"]].sort_values(by=["Video", "Point"])
 
     # 创建 x 轴标签：Video_Point
-    df_sorted["x_label"] = df_sorted["Video"].astype(str) + "_" + df_sorted["Point"].astype(str)
+    df_sorted["x_label"] = video_point_labels(df_sorted)
 
     # 分离 anchor 和 test 数据
     anchor_data = df_sorted[df_sorted["Side"] == anchor_label]
@@ -330,42 +340,25 @@ def create_fps_chart(
     return fig
 
 
-def color_positive_green(val):
-    """
-    正值显示绿色，负值显示红色（用于 FPS 等越大越好的指标）
-
-    Args:
-        val: 数值
-
-    Returns:
-        CSS 样式字符串
-    """
-    if pd.isna(val) or not isinstance(val, (int, float)):
-        return ""
-    if val > 0:
-        return "color: green"
-    elif val < 0:
-        return "color: red"
-    return ""
-
-
-def color_positive_red(val):
+def sign_color_styles(
+    df: "pd.DataFrame",
+    pos_css: str = "color: green",
+    neg_css: str = "color: red",
+) -> "pd.DataFrame":
     """
-    正值显示红色，负值显示绿色（用于 CPU、Bitrate 等越小越好的指标）
+    按数值正负向量化生成与 df 同形的 CSS 样式表，供 Styler.apply(..., axis=None) 使用
 
     Args:
-        val: 数值
+        df: 待着色的数值列
+        pos_css: 正值样式（默认绿色，适用于 FPS 等越大越好的指标）
+        neg_css: 负值样式（默认红色）；CPU、Bitrate 等越小越好的指标传入相反颜色
 
     Returns:
-        CSS 样式字符串
+        CSS 样式 DataFrame，NaN/非数值/0 为空字符串
     """
-    if pd.isna(val) or not isinstance(val, (int, float)):
-        return ""
-    if val > 0:
-        return "color: red"
-    elif val < 0:
-        return "color: green"
-    return ""
+    values = df.apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    styles = np.where(values > 0, pos_css, np.where(values < 0, neg_css, ""))
+    return pd.DataFrame(styles, index=df.index, columns=df.columns)
 
 
 def _summary_stats(series: "pd.Series") -> Tuple[Any, Any, Any]:
@@ -865,6 +858,15 @@ def _format_points(points: Optional[List[float]]) -> str:
     return ", ".join(f"{p:g}" for p in sorted(set(clean)))
 
 
+def _highlight_if_diff(value: Any, other_value: Any) -> str:
+    """如果值不同，返回红色高亮的 HTML"""
+    value_str = str(value) if value is not None else 'N/A'
+    other_str = str(other_value) if other_value is not None else 'N/A'
+    if value_str != other_str:
+        return f'<span style="color: red;">{value_str}</span>'
+    return value_str
+
+
 def _format_env_info_with_diff(env: Dict[str, Any], other_env: Dict[str, Any]) -> str:
     """格式化环境信息，标红不同的字段
 
@@ -878,14 +880,6 @@ def _format_env_info_with_diff(env: Dict[str, Any], other_env: Dict[str, Any]) -
     if not env:
         return "未采集到环境信息。"
 
-    def _highlight_if_diff(value: Any, other_value: Any) -> str:
-        """如果值不同，返回红色高亮的 HTML"""
-        value_str = str(value) if value is not None else 'N/A'
-        other_str = str(other_value) if other_value is not None else 'N/A'
-        if value_str != other_str:
-            return f'<span style="color: red;">{value_str}</span>'
-        return value_str
-
     lines = []
 
     # 系统信息
@@ -3,21 +3,163 @@ Streamlit UI 复用组件
 
 提取 Metrics 页面常用片段（平滑滚动样式、性能对比区域），减少重复代码。
 """
-from typing import Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
+import plotly.graph_objects as go
 import streamlit as st
 
 from src.utils.streamlit_helpers import (
+    _cpu_peak_trace,
+    _format_encoder_params,
+    _format_encoder_type,
+    _format_points,
+    _render_overall_table,
+    _summary_stats,
+    aggregate_cpu_samples,
     create_cpu_chart,
     create_fps_chart,
-    color_positive_green,
-    color_positive_red,
     render_delta_bar_chart_by_point,
     render_delta_table_expander,
+    sign_color_styles,
+    video_point_labels,
 )
 
 
+# 局部重跑装饰器：st.fragment（>=1.37）/ st.experimental_fragment（>=1.33），更老的版本退化为整页重跑
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+# 性能明细表中不展示的 CPU 采样列
+_CPU_SAMPLE_COLUMNS = ("cpu_samples", "cpu_sample_interval_ms")
+
+
+def _sample_interval_ms(row: "pd.Series") -> int:
+    """读取行内的 CPU 原始采样间隔（毫秒），旧报告缺失该字段时按 100ms 处理"""
+    value = row.get("cpu_sample_interval_ms")
+    return int(value) if value is not None and pd.notna(value) else 100
+
+
+def _index_perf_rows(df_perf: pd.DataFrame, keys: List[str]) -> Tuple[Dict[tuple, "np.ndarray"], Dict[object, List[object]]]:
+    """
+    一次 groupby 建立性能数据索引，供视频/点位下拉框与 CPU 采样查找复用
+
+    Returns:
+        (行索引, 视频 -> 点位列表)；行索引为 keys 取值元组 -> 行位置数组，
+        视频与点位均按首次出现顺序排列（与 unique() 一致）
+    """
+    row_index = df_perf.groupby(keys, sort=False, dropna=False).indices
+    points_by_video: Dict[object, Dict[object, None]] = {}
+    for key in row_index:
+        points_by_video.setdefault(key[0], {})[key[1]] = None
+    return row_index, {video: list(points) for video, points in points_by_video.items()}
+
+
+def _cpu_samples_at(df_perf: pd.DataFrame, positions: Optional["np.ndarray"]) -> Tuple[np.ndarray, int]:
+    """取首个匹配行的 CPU 采样（float32 数组）及其采样间隔（毫秒），无匹配行时返回空数组"""
+    if positions is None or len(positions) == 0:
+        return np.empty(0, dtype=np.float32), 100
+    row = df_perf.iloc[positions[0]]
+    samples = row.get("cpu_samples")
+    if samples is None or (np.isscalar(samples) and pd.isna(samples)):
+        return np.empty(0, dtype=np.float32), _sample_interval_ms(row)
+    return np.asarray(samples, dtype=np.float32), _sample_interval_ms(row)
+
+
+def _join_sides(
+    anchor_df: pd.DataFrame,
+    test_df: pd.DataFrame,
+    keys: List[str],
+    value_cols: List[str],
+) -> pd.DataFrame:
+    """
+    按 keys 对齐 Anchor/Test 两侧的 value_cols（索引 join，仅保留两侧都有的行）
+
+    只带上需要的列，列名追加 _anchor / _test 后缀，与 merge(suffixes=...) 的结果一致。
+    """
+    anchor = anchor_df[keys + value_cols].set_index(keys).add_suffix("_anchor")
+    test = test_df[keys + value_cols].set_index(keys).add_suffix("_test")
+    return anchor.join(test, how="inner").reset_index()
+
+
+def _number_columns(fmt: Dict[str, str]) -> Dict[str, Any]:
+    """列名 -> printf 格式 转为 NumberColumn 配置：由前端格式化，不经 Styler 逐单元格生成 HTML"""
+    return {col: st.column_config.NumberColumn(format=spec) for col, spec in fmt.items()}
+
+
+def _mean_cpu(samples: np.ndarray) -> float:
+    """CPU 采样均值（float32 数组向量化求和），无采样时为 0"""
+    if samples.size == 0:
+        return 0.0
+    return float(samples.mean())
+
+
+@st.cache_data(show_spinner=False)
+def _cached_cpu_chart(
+    anchor_samples: np.ndarray,
+    test_samples: np.ndarray,
+    agg_interval: int,
+    title: str,
+    anchor_label: str,
+    test_label: str,
+    anchor_sample_interval_ms: int,
+    test_sample_interval_ms: int,
+):
+    """按输入缓存 CPU 对比图：无关控件触发重跑时直接复用，不再重建 Figure"""
+    return create_cpu_chart(
+        anchor_samples=anchor_samples,
+        test_samples=test_samples,
+        agg_interval=agg_interval,
+        title=title,
+        anchor_label=anchor_label,
+        test_label=test_label,
+        anchor_sample_interval_ms=anchor_sample_interval_ms,
+        test_sample_interval_ms=test_sample_interval_ms,
+    )
+
+
+@st.cache_data(show_spinner=False)
+def _cached_fps_chart(df_fps: pd.DataFrame, anchor_label: str, test_label: str):
+    """按输入缓存 FPS 对比图（df_fps 仅含 Video/Point/Side/FPS 列）"""
+    return create_fps_chart(df_perf=df_fps, anchor_label=anchor_label, test_label=test_label)
+
+
+@st.cache_data(show_spinner=False)
+def _perf_delta_frames(df_delta: pd.DataFrame, anchor_label: str, test_label: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    按输入缓存性能 Delta 的中间结果（df_delta 仅含 Video/Point/Side/FPS/CPU Avg(%) 列）
+
+    Returns:
+        (merged_perf, diff_perf_df)：前者供柱状图使用，后者为展示用的 Delta 表；
+        两侧没有可对齐的行时 merged_perf 为空，diff_perf_df 为空表
+    """
+    anchor_perf = df_delta[df_delta["Side"] == anchor_label]
+    test_perf = df_delta[df_delta["Side"] == test_label]
+    merged_perf = _join_sides(anchor_perf, test_perf, ["Video", "Point"], ["FPS", "CPU Avg(%)"])
+    if merged_perf.empty:
+        return merged_perf, pd.DataFrame()
+
+    test_block = merged_perf[["FPS_test", "CPU Avg(%)_test"]].to_numpy(dtype=float, na_value=np.nan)
+    anchor_block = merged_perf[["FPS_anchor", "CPU Avg(%)_anchor"]].to_numpy(dtype=float, na_value=np.nan)
+    merged_perf[["Δ FPS", "Δ CPU Avg(%)"]] = test_block - anchor_block
+
+    diff_perf_df = merged_perf[
+        ["Video", "Point", "FPS_anchor", "FPS_test", "Δ FPS", "CPU Avg(%)_anchor", "CPU Avg(%)_test", "Δ CPU Avg(%)"]
+    ].rename(
+        columns={
+            "FPS_anchor": f"{anchor_label} FPS",
+            "FPS_test": f"{test_label} FPS",
+            "CPU Avg(%)_anchor": f"{anchor_label} CPU(%)",
+            "CPU Avg(%)_test": f"{test_label} CPU(%)",
+        }
+    ).sort_values(by=["Video", "Point"]).reset_index(drop=True)
+
+    # 已按 Video 排序，连续重复的视频名只保留第一行
+    videos = diff_perf_df["Video"]
+    diff_perf_df["Video"] = videos.mask(videos.eq(videos.shift()), "")
+    return merged_perf, diff_perf_df
+
+
 def inject_smooth_scroll_css() -> None:
     """开启页面平滑滚动"""
     st.markdown(
@@ -32,55 +174,20 @@ html {
     )
 
 
-def render_performance_section(
+@_fragment
+def _render_perf_delta(
     df_perf: pd.DataFrame,
     anchor_label: str,
     test_label: str,
-    detail_df: Optional[pd.DataFrame] = None,
-    detail_format: Optional[Dict[str, str]] = None,
-    delta_point_key: str = "perf_delta_point",
-    delta_metric_key: str = "perf_delta_metric",
-    cpu_video_key: str = "perf_video",
-    cpu_point_key: str = "perf_point",
-    cpu_agg_key: str = "cpu_agg",
+    delta_point_key: str,
+    delta_metric_key: str,
 ) -> None:
-    """统一渲染性能对比区块（Delta + CPU + FPS + Details）"""
-    st.header("Performance", anchor="performance")
-
-    if df_perf is None or df_perf.empty:
-        st.info("暂无性能数据。请确保编码任务已完成并采集了性能数据。")
-        return
-
-    # 1) 汇总 Diff
-    anchor_perf = df_perf[df_perf["Side"] == anchor_label]
-    test_perf = df_perf[df_perf["Side"] == test_label]
-    merged_perf = anchor_perf.merge(
-        test_perf,
-        on=["Video", "Point"],
-        suffixes=("_anchor", "_test"),
+    """性能 Delta 区块（柱状图 + 表格）"""
+    # 按内容缓存：重跑时不再重新 join/排序
+    merged_perf, diff_perf_df = _perf_delta_frames(
+        df_perf[["Video", "Point", "Side", "FPS", "CPU Avg(%)"]], anchor_label, test_label
     )
     if not merged_perf.empty:
-        merged_perf["Δ FPS"] = merged_perf["FPS_test"] - merged_perf["FPS_anchor"]
-        merged_perf["Δ CPU Avg(%)"] = merged_perf["CPU Avg(%)_test"] - merged_perf["CPU Avg(%)_anchor"]
-
-        diff_perf_df = merged_perf[
-            ["Video", "Point", "FPS_anchor", "FPS_test", "Δ FPS", "CPU Avg(%)_anchor", "CPU Avg(%)_test", "Δ CPU Avg(%)"]
-        ].rename(
-            columns={
-                "FPS_anchor": f"{anchor_label} FPS",
-                "FPS_test": f"{test_label} FPS",
-                "CPU Avg(%)_anchor": f"{anchor_label} CPU(%)",
-                "CPU Avg(%)_test": f"{test_label} CPU(%)",
-            }
-        ).sort_values(by=["Video", "Point"]).reset_index(drop=True)
-
-        prev_video = None
-        for idx in diff_perf_df.index:
-            if diff_perf_df.at[idx, "Video"] == prev_video:
-                diff_perf_df.at[idx, "Video"] = ""
-            else:
-                prev_video = diff_perf_df.at[idx, "Video"]
-
         perf_format_dict = {
             "Point": "{:.2f}",
             f"{anchor_label} FPS": "{:.2f}",
@@ -92,8 +199,8 @@ def render_performance_section(
         }
 
         styled_perf = (
-            diff_perf_df.style.applymap(color_positive_green, subset=["Δ FPS"])
-            .applymap(color_positive_red, subset=["Δ CPU Avg(%)"])
+            diff_perf_df.style.apply(sign_color_styles, subset=["Δ FPS"], axis=None)
+            .apply(sign_color_styles, subset=["Δ CPU Avg(%)"], axis=None, pos_css="color: red", neg_css="color: green")
             .format(perf_format_dict, na_rep="-")
         )
 
@@ -116,41 +223,52 @@ def render_performance_section(
 
         render_delta_table_expander("查看 Delta 表格", styled_perf)
 
-    # 2) CPU 折线
+
+@_fragment
+def _render_perf_cpu(
+    df_perf: pd.DataFrame,
+    anchor_label: str,
+    test_label: str,
+    cpu_video_key: str,
+    cpu_point_key: str,
+    cpu_agg_key: str,
+) -> None:
+    """CPU 占用率区块（视频/点位选择 + 聚合间隔 + 折线图）"""
     st.subheader("CPU Usage", anchor="cpu-chart")
-    video_list_perf = df_perf["Video"].unique().tolist()
+    perf_index, points_by_video = _index_perf_rows(df_perf, ["Video", "Point", "Side"])
+    video_list_perf = list(points_by_video)
     if video_list_perf:
         col_sel_perf1, col_sel_perf2 = st.columns(2)
         with col_sel_perf1:
             selected_video_perf = st.selectbox("选择视频", video_list_perf, key=cpu_video_key)
         with col_sel_perf2:
-            point_list_perf = df_perf[df_perf["Video"] == selected_video_perf]["Point"].unique().tolist()
+            point_list_perf = points_by_video[selected_video_perf]
             selected_point_perf = st.selectbox("选择码率点位", point_list_perf, key=cpu_point_key)
 
         agg_interval = st.slider("聚合间隔 (ms)", min_value=100, max_value=1000, value=100, step=100, key=cpu_agg_key)
 
-        anchor_samples = []
-        test_samples = []
-        for _, row in df_perf.iterrows():
-            if row["Video"] == selected_video_perf and row["Point"] == selected_point_perf:
-                if row["Side"] == anchor_label:
-                    anchor_samples = row.get("cpu_samples", []) or []
-                else:
-                    test_samples = row.get("cpu_samples", []) or []
-
-        if anchor_samples or test_samples:
-            fig_cpu = create_cpu_chart(
-                anchor_samples=anchor_samples,
-                test_samples=test_samples,
-                agg_interval=agg_interval,
-                title=f"CPU占用率 - {selected_video_perf} ({selected_point_perf})",
-                anchor_label=anchor_label,
-                test_label=test_label,
+        anchor_samples, anchor_interval_ms = _cpu_samples_at(
+            df_perf, perf_index.get((selected_video_perf, selected_point_perf, anchor_label))
+        )
+        test_samples, test_interval_ms = _cpu_samples_at(
+            df_perf, perf_index.get((selected_video_perf, selected_point_perf, test_label))
+        )
+
+        if anchor_samples.size or test_samples.size:
+            fig_cpu = _cached_cpu_chart(
+                anchor_samples,
+                test_samples,
+                agg_interval,
+                f"CPU占用率 - {selected_video_perf} ({selected_point_perf})",
+                anchor_label,
+                test_label,
+                anchor_interval_ms,
+                test_interval_ms,
             )
             st.plotly_chart(fig_cpu, use_container_width=True)
 
-            anchor_avg_cpu = sum(anchor_samples) / len(anchor_samples) if anchor_samples else 0
-            test_avg_cpu = sum(test_samples) / len(test_samples) if test_samples else 0
+            anchor_avg_cpu = _mean_cpu(anchor_samples)
+            test_avg_cpu = _mean_cpu(test_samples)
             cpu_diff_pct = ((test_avg_cpu - anchor_avg_cpu) / anchor_avg_cpu * 100) if anchor_avg_cpu > 0 else 0
 
             col_cpu1, col_cpu2, col_cpu3 = st.columns(3)
@@ -160,35 +278,61 @@ def render_performance_section(
         else:
             st.info("该视频/点位没有CPU采样数据。")
 
+
+def render_performance_section(
+    df_perf: pd.DataFrame,
+    anchor_label: str,
+    test_label: str,
+    detail_df: Optional[pd.DataFrame] = None,
+    detail_format: Optional[Dict[str, str]] = None,
+    delta_point_key: str = "perf_delta_point",
+    delta_metric_key: str = "perf_delta_metric",
+    cpu_video_key: str = "perf_video",
+    cpu_point_key: str = "perf_point",
+    cpu_agg_key: str = "cpu_agg",
+) -> None:
+    """统一渲染性能对比区块（Delta + CPU + FPS + Details）"""
+    st.header("Performance", anchor="performance")
+
+    if df_perf is None or df_perf.empty:
+        st.info("暂无性能数据。请确保编码任务已完成并采集了性能数据。")
+        return
+
+    # 1) 汇总 Diff / 2) CPU 折线：各自带控件，放在独立 fragment 中，控件变化只重跑所在区块
+    _render_perf_delta(df_perf, anchor_label, test_label, delta_point_key, delta_metric_key)
+    _render_perf_cpu(df_perf, anchor_label, test_label, cpu_video_key, cpu_point_key, cpu_agg_key)
+
     # 3) FPS
     st.subheader("FPS", anchor="fps-chart")
-    fig_fps = create_fps_chart(
-        df_perf=df_perf,
-        anchor_label=anchor_label,
-        test_label=test_label,
-    )
+    fig_fps = _cached_fps_chart(df_perf[["Video", "Point", "Side", "FPS"]], anchor_label, test_label)
     st.plotly_chart(fig_fps, use_container_width=True)
 
     # 4) 详情
     st.subheader("Details", anchor="perf-details")
     with st.expander("查看详细性能数据", expanded=False):
-        df_detail = detail_df.copy() if detail_df is not None else df_perf.copy()
-        df_detail = df_detail.drop(columns=["cpu_samples"], errors="ignore")
-
-        fmt = detail_format or {
-            "Point": "{:.2f}",
-            "FPS": "{:.2f}",
-            "CPU Avg(%)": "{:.2f}",
-        }
+        source_df = detail_df if detail_df is not None else df_perf
+        # 仅投影需要展示的列，不复制体积最大的 cpu_samples 列
+        df_detail = source_df[[c for c in source_df.columns if c not in _CPU_SAMPLE_COLUMNS]]
+
+        fmt = dict(detail_format or {
+            "Point": "%.2f",
+            "FPS": "%.2f",
+            "CPU Avg(%)": "%.2f",
+        })
         if "CPU Max(%)" in df_detail.columns:
-            fmt.setdefault("CPU Max(%)", "{:.2f}")
+            fmt.setdefault("CPU Max(%)", "%.2f")
         if "Total Time(s)" in df_detail.columns:
-            fmt.setdefault("Total Time(s)", "{:.2f}")
+            fmt.setdefault("Total Time(s)", "%.2f")
         if "Frames" in df_detail.columns:
-            fmt.setdefault("Frames", "{:.0f}")
-
-        styled_perf_detail = df_detail.sort_values(by=["Video", "Point", "Side"]).style.format(fmt, na_rep="-")
-        st.dataframe(styled_perf_detail, use_container_width=True, hide_index=True)
+            fmt.setdefault("Frames", "%.0f")
+
+        # 列保持数值类型（可按数值排序），格式化交给前端
+        st.dataframe(
+            df_detail.sort_values(by=["Video", "Point", "Side"]),
+            column_config=_number_columns({col: spec for col, spec in fmt.items() if col in df_detail.columns}),
+            use_container_width=True,
+            hide_index=True,
+        )
 
 
 def render_sidebar_contents(has_bd: bool = False) -> None:
@@ -204,16 +348,9 @@ def render_sidebar_contents(has_bd: bool = False) -> None:
     ]
     if has_bd:
         contents += [
+            # 柱状图默认关闭，其子标题锚点未必存在，目录只指向章节标题
             "- [BD-Rate](#bd-rate)",
-            "  - [BD-Rate PSNR](#bd-rate-psnr)",
-            "  - [BD-Rate SSIM](#bd-rate-ssim)",
-            "  - [BD-Rate VMAF](#bd-rate-vmaf)",
-            "  - [BD-Rate VMAF-NEG](#bd-rate-vmaf-neg)",
             "- [BD-Metrics](#bd-metrics)",
-            "  - [BD PSNR](#bd-psnr)",
-            "  - [BD SSIM](#bd-ssim)",
-            "  - [BD VMAF](#bd-vmaf)",
-            "  - [BD VMAF-NEG](#bd-vmaf-neg)",
         ]
     contents += [
         "- [Performance](#performance)",
@@ -228,8 +365,6 @@ def render_sidebar_contents(has_bd: bool = False) -> None:
 
 def render_rd_curves(df: "pd.DataFrame", anchor_label: str = "Anchor", test_label: str = "Test") -> None:
     """渲染 RD 曲线"""
-    import plotly.graph_objects as go
-
     st.subheader("RD Curves", anchor="rd-curve")
     video_list = df["Video"].unique().tolist()
     metric_options = ["PSNR", "SSIM", "VMAF", "VMAF-NEG"]
@@ -245,27 +380,24 @@ def render_rd_curves(df: "pd.DataFrame", anchor_label: str = "Anchor", test_labe
     anchor_data = video_df[video_df["Side"] == anchor_label].sort_values("Bitrate_kbps")
     test_data = video_df[video_df["Side"] == test_label].sort_values("Bitrate_kbps")
 
-    fig_rd = go.Figure()
-    fig_rd.add_trace(
-        go.Scatter(
-            x=anchor_data["Bitrate_kbps"],
-            y=anchor_data[selected_metric],
-            mode="lines+markers",
-            name=anchor_label,
-            marker=dict(size=10, color="#636efa"),
-            line=dict(width=2, shape="spline", smoothing=1.3, color="#636efa"),
-        )
+    anchor_trace = go.Scatter(
+        x=anchor_data["Bitrate_kbps"],
+        y=anchor_data[selected_metric],
+        mode="lines+markers",
+        name=anchor_label,
+        marker=dict(size=10, color="#636efa"),
+        line=dict(width=2, shape="spline", smoothing=1.3, color="#636efa"),
     )
-    fig_rd.add_trace(
-        go.Scatter(
-            x=test_data["Bitrate_kbps"],
-            y=test_data[selected_metric],
-            mode="lines+markers",
-            name=test_label,
-            marker=dict(size=10, color="#f0553b"),
-            line=dict(width=2, shape="spline", smoothing=1.3, color="#f0553b"),
-        )
+    test_trace = go.Scatter(
+        x=test_data["Bitrate_kbps"],
+        y=test_data[selected_metric],
+        mode="lines+markers",
+        name=test_label,
+        marker=dict(size=10, color="#f0553b"),
+        line=dict(width=2, shape="spline", smoothing=1.3, color="#f0553b"),
     )
+    fig_rd = go.Figure()
+    fig_rd.add_traces([anchor_trace, test_trace])
     fig_rd.update_layout(
         title=f"RD Curves - {selected_video}",
         xaxis_title="Bitrate (kbps)",
@@ -285,40 +417,28 @@ def render_metrics_delta(
     metric_key: str = "metrics_delta_metric",
 ) -> None:
     """渲染 Metrics Delta 对比"""
-    import pandas as pd
-    from src.utils.streamlit_helpers import render_delta_bar_chart_by_point, render_delta_table_expander
-
     anchor_df = df[df["Side"] == anchor_label]
     test_df = df[df["Side"] == test_label]
-    merged = anchor_df.merge(test_df, on=["Video", "RC", "Point"], suffixes=("_anchor", "_test"))
+    merged = _join_sides(
+        anchor_df, test_df, ["Video", "RC", "Point"], ["Bitrate_kbps", "PSNR", "SSIM", "VMAF", "VMAF-NEG"]
+    )
 
     if not merged.empty:
         merged["Bitrate Δ%"] = ((merged["Bitrate_kbps_test"] - merged["Bitrate_kbps_anchor"]) / merged["Bitrate_kbps_anchor"].replace(0, pd.NA)) * 100
-        merged["PSNR Δ"] = merged["PSNR_test"] - merged["PSNR_anchor"]
-        merged["SSIM Δ"] = merged["SSIM_test"] - merged["SSIM_anchor"]
-        merged["VMAF Δ"] = merged["VMAF_test"] - merged["VMAF_anchor"]
-        merged["VMAF-NEG Δ"] = merged["VMAF-NEG_test"] - merged["VMAF-NEG_anchor"]
+        # 四个指标差值在一个二维块上一次相减
+        metric_cols = ["PSNR", "SSIM", "VMAF", "VMAF-NEG"]
+        test_block = merged[[f"{c}_test" for c in metric_cols]].to_numpy(dtype=float, na_value=np.nan)
+        anchor_block = merged[[f"{c}_anchor" for c in metric_cols]].to_numpy(dtype=float, na_value=np.nan)
+        merged[[f"{c} Δ" for c in metric_cols]] = test_block - anchor_block
 
         diff_df = merged[
             ["Video", "RC", "Point", "Bitrate Δ%", "PSNR Δ", "SSIM Δ", "VMAF Δ", "VMAF-NEG Δ"]
         ].sort_values(by=["Video", "Point"]).reset_index(drop=True)
         chart_df = diff_df.copy()
 
-        prev_video = None
-        for idx in diff_df.index:
-            if diff_df.at[idx, "Video"] == prev_video:
-                diff_df.at[idx, "Video"] = ""
-            else:
-                prev_video = diff_df.at[idx, "Video"]
-
-        def _color_diff(val):
-            if pd.isna(val) or not isinstance(val, (int, float)):
-                return ""
-            if val > 0:
-                return "color: green"
-            elif val < 0:
-                return "color: red"
-            return ""
+        # 已按 Video 排序，连续重复的视频名只保留第一行
+        videos = diff_df["Video"]
+        diff_df["Video"] = videos.mask(videos.eq(videos.shift()), "")
 
         diff_cols = ["Bitrate Δ%", "PSNR Δ", "SSIM Δ", "VMAF Δ", "VMAF-NEG Δ"]
         format_dict = {
@@ -329,7 +449,7 @@ def render_metrics_delta(
             "VMAF Δ": "{:.2f}",
             "VMAF-NEG Δ": "{:.2f}",
         }
-        styled_df = diff_df.style.applymap(_color_diff, subset=diff_cols).format(format_dict, na_rep="-")
+        styled_df = diff_df.style.apply(sign_color_styles, subset=diff_cols, axis=None).format(format_dict, na_rep="-")
 
         st.subheader("Delta", anchor="delta")
 
@@ -360,152 +480,155 @@ def render_metrics_delta(
         )
 
 
-def render_bd_rate_section(bd_list: list) -> None:
-    """渲染 BD-Rate 分析区块"""
-    import pandas as pd
-    import plotly.graph_objects as go
+# BD 柱状图：(数据列, 小标题, 锚点[, 图表标题])
+_BD_RATE_CHARTS = (
+    ("bd_rate_psnr", "BD-Rate PSNR", "bd-rate-psnr"),
+    ("bd_rate_ssim", "BD-Rate SSIM", "bd-rate-ssim"),
+    ("bd_rate_vmaf", "BD-Rate VMAF", "bd-rate-vmaf"),
+    ("bd_rate_vmaf_neg", "BD-Rate VMAF-NEG", "bd-rate-vmaf-neg"),
+)
+_BD_METRICS_CHARTS = (
+    ("bd_psnr", "BD PSNR", "bd-psnr", "BD PSNR, the more, the better"),
+    ("bd_ssim", "BD SSIM", "bd-ssim", "BD SSIM, the more, the better"),
+    ("bd_vmaf", "BD VMAF", "bd-vmaf", "BD VMAF, the more, the better"),
+    ("bd_vmaf_neg", "BD VMAF-NEG", "bd-vmaf-neg", "BD VMAF-NEG"),
+)
 
-    st.header("BD-Rate", anchor="bd-rate")
-    if bd_list:
-        df_bd = pd.DataFrame(bd_list)
-
-        def _color_bd_rate(val):
-            if pd.isna(val) or not isinstance(val, (int, float)):
-                return ""
-            if val < 0:
-                return "color: green"
-            elif val > 0:
-                return "color: red"
-            return ""
-
-        bd_rate_cols = ["bd_rate_psnr", "bd_rate_ssim", "bd_rate_vmaf", "bd_rate_vmaf_neg"]
-        bd_rate_display = df_bd[["source"] + bd_rate_cols].rename(
-            columns={
-                "source": "Video",
-                "bd_rate_psnr": "BD-Rate PSNR (%)",
-                "bd_rate_ssim": "BD-Rate SSIM (%)",
-                "bd_rate_vmaf": "BD-Rate VMAF (%)",
-                "bd_rate_vmaf_neg": "BD-Rate VMAF-NEG (%)",
-            }
+
+def _bar_colors_and_text(values: pd.Series, neg_color: str, pos_color: str, fmt: str) -> Tuple[List[str], List[str]]:
+    """向量化生成柱状图颜色（负/正/零或缺失为灰色）与标注文本（缺失为空）"""
+    numeric = pd.to_numeric(values, errors="coerce")
+    filled = numeric.fillna(0).to_numpy(dtype=float)
+    colors = np.where(filled < 0, neg_color, np.where(filled > 0, pos_color, "gray")).tolist()
+    text = numeric.map(fmt.format, na_action="ignore").fillna("").tolist()
+    return colors, text
+
+
+@st.cache_data(show_spinner=False)
+def _create_bd_bar_chart(df: "pd.DataFrame", col: str, title: str):
+    """BD-Rate 柱状图（按 source/col 两列数据缓存）"""
+    colors, text = _bar_colors_and_text(df[col], "#00cc96", "#ef553b", "{:.2f}%")
+    fig = go.Figure()
+    fig.add_trace(
+        go.Bar(
+            x=df["source"],
+            y=df[col],
+            marker_color=colors,
+            text=text,
+            textposition="outside",
         )
-        styled_bd_rate = bd_rate_display.style.applymap(
-            _color_bd_rate,
-            subset=["BD-Rate PSNR (%)", "BD-Rate SSIM (%)", "BD-Rate VMAF (%)", "BD-Rate VMAF-NEG (%)"],
-        ).format({
-            "BD-Rate PSNR (%)": "{:.2f}",
-            "BD-Rate SSIM (%)": "{:.2f}",
-            "BD-Rate VMAF (%)": "{:.2f}",
-            "BD-Rate VMAF-NEG (%)": "{:.2f}",
-        }, na_rep="-")
-        st.dataframe(styled_bd_rate, use_container_width=True, hide_index=True)
-
-        def _create_bd_bar_chart(df, col, title):
-            colors = ["#00cc96" if v < 0 else "#ef553b" if v > 0 else "gray" for v in df[col].fillna(0)]
-            fig = go.Figure()
-            fig.add_trace(
-                go.Bar(
-                    x=df["source"],
-                    y=df[col],
-                    marker_color=colors,
-                    text=[f"{v:.2f}%" if pd.notna(v) else "" for v in df[col]],
-                    textposition="outside",
-                )
-            )
-            fig.update_layout(
-                title=title,
-                xaxis_title="Video",
-                yaxis_title="BD-Rate (%)",
-                showlegend=False,
-            )
-            return fig
+    )
+    fig.update_layout(
+        title=title,
+        xaxis_title="Video",
+        yaxis_title="BD-Rate (%)",
+        showlegend=False,
+    )
+    return fig
+
+
+@st.cache_data(show_spinner=False)
+def _create_bd_metrics_bar_chart(df: "pd.DataFrame", col: str, title: str):
+    """BD-Metrics 柱状图（按 source/col 两列数据缓存）"""
+    colors, text = _bar_colors_and_text(df[col], "#ef553b", "#00cc96", "{:.4f}")
+    fig = go.Figure()
+    fig.add_trace(
+        go.Bar(
+            x=df["source"],
+            y=df[col],
+            marker_color=colors,
+            text=text,
+            textposition="outside",
+        )
+    )
+    fig.update_layout(
+        title=title,
+        xaxis_title="Video",
+        yaxis_title="Δ Metric",
+        showlegend=False,
+    )
+    return fig
 
-        st.subheader("BD-Rate PSNR", anchor="bd-rate-psnr")
-        st.plotly_chart(_create_bd_bar_chart(df_bd, "bd_rate_psnr", "BD-Rate PSNR, the less, the better"), use_container_width=True)
 
-        st.subheader("BD-Rate SSIM", anchor="bd-rate-ssim")
-        st.plotly_chart(_create_bd_bar_chart(df_bd, "bd_rate_ssim", "BD-Rate SSIM, the less, the better"), use_container_width=True)
+def render_bd_rate_section(bd_list: list) -> None:
+    """渲染 BD-Rate 分析区块"""
+    st.header("BD-Rate", anchor="bd-rate")
+    if not bd_list:
+        st.info("暂无 BD-Rate 数据。")
+        return
 
-        st.subheader("BD-Rate VMAF", anchor="bd-rate-vmaf")
-        st.plotly_chart(_create_bd_bar_chart(df_bd, "bd_rate_vmaf", "BD-Rate VMAF, the less, the better"), use_container_width=True)
+    df_bd = pd.DataFrame(bd_list)
 
-        st.subheader("BD-Rate VMAF-NEG", anchor="bd-rate-vmaf-neg")
-        st.plotly_chart(_create_bd_bar_chart(df_bd, "bd_rate_vmaf_neg", "BD-Rate VMAF-NEG, the less, the better"), use_container_width=True)
-    else:
-        st.info("暂无 BD-Rate 数据。")
+    bd_rate_cols = ["bd_rate_psnr", "bd_rate_ssim", "bd_rate_vmaf", "bd_rate_vmaf_neg"]
+    bd_rate_display = df_bd[["source"] + bd_rate_cols].rename(
+        columns={
+            "source": "Video",
+            "bd_rate_psnr": "BD-Rate PSNR (%)",
+            "bd_rate_ssim": "BD-Rate SSIM (%)",
+            "bd_rate_vmaf": "BD-Rate VMAF (%)",
+            "bd_rate_vmaf_neg": "BD-Rate VMAF-NEG (%)",
+        }
+    )
+    st.dataframe(
+        bd_rate_display,
+        column_config=_number_columns({
+            "BD-Rate PSNR (%)": "%+.2f",
+            "BD-Rate SSIM (%)": "%+.2f",
+            "BD-Rate VMAF (%)": "%+.2f",
+            "BD-Rate VMAF-NEG (%)": "%+.2f",
+        }),
+        use_container_width=True,
+        hide_index=True,
+    )
+
+    # 关闭后不再构建/下发四张柱状图（选择保存在 session_state 中）
+    if st.toggle("显示 BD-Rate 柱状图", value=False, key="bd_rate_show_charts"):
+        for col, subheader, anchor in _BD_RATE_CHARTS:
+            st.subheader(subheader, anchor=anchor)
+            st.plotly_chart(
+                _create_bd_bar_chart(df_bd[["source", col]], col, f"{subheader}, the less, the better"),
+                use_container_width=True,
+            )
 
 
 def render_bd_metrics_section(bd_list: list) -> None:
     """渲染 BD-Metrics 分析区块"""
-    import pandas as pd
-    import plotly.graph_objects as go
-
     st.header("BD-Metrics", anchor="bd-metrics")
-    if bd_list:
-        df_bdm = pd.DataFrame(bd_list)
-
-        def _color_bd_metrics(val):
-            if pd.isna(val) or not isinstance(val, (int, float)):
-                return ""
-            if val > 0:
-                return "color: green"
-            elif val < 0:
-                return "color: red"
-            return ""
-
-        bd_metrics_cols = ["bd_psnr", "bd_ssim", "bd_vmaf", "bd_vmaf_neg"]
-        bd_metrics_display = df_bdm[["source"] + bd_metrics_cols].rename(
-            columns={
-                "source": "Video",
-                "bd_psnr": "BD PSNR",
-                "bd_ssim": "BD SSIM",
-                "bd_vmaf": "BD VMAF",
-                "bd_vmaf_neg": "BD VMAF-NEG",
-            }
-        )
-        styled_bd_metrics = bd_metrics_display.style.applymap(
-            _color_bd_metrics,
-            subset=["BD PSNR", "BD SSIM", "BD VMAF", "BD VMAF-NEG"],
-        ).format({
-            "BD PSNR": "{:.4f}",
-            "BD SSIM": "{:.4f}",
-            "BD VMAF": "{:.2f}",
-            "BD VMAF-NEG": "{:.2f}",
-        }, na_rep="-")
-        st.dataframe(styled_bd_metrics, use_container_width=True, hide_index=True)
-
-        def _create_bd_metrics_bar_chart(df, col, title):
-            colors = ["#00cc96" if v > 0 else "#ef553b" if v < 0 else "gray" for v in df[col].fillna(0)]
-            fig = go.Figure()
-            fig.add_trace(
-                go.Bar(
-                    x=df["source"],
-                    y=df[col],
-                    marker_color=colors,
-                    text=[f"{v:.4f}" if pd.notna(v) else "" for v in df[col]],
-                    textposition="outside",
-                )
-            )
-            fig.update_layout(
-                title=title,
-                xaxis_title="Video",
-                yaxis_title="Δ Metric",
-                showlegend=False,
-            )
-            return fig
-
-        st.subheader("BD PSNR", anchor="bd-psnr")
-        st.plotly_chart(_create_bd_metrics_bar_chart(df_bdm, "bd_psnr", "BD PSNR, the more, the better"), use_container_width=True)
+    if not bd_list:
+        st.info("暂无 BD-Metrics 数据。")
+        return
 
-        st.subheader("BD SSIM", anchor="bd-ssim")
-        st.plotly_chart(_create_bd_metrics_bar_chart(df_bdm, "bd_ssim", "BD SSIM, the more, the better"), use_container_width=True)
+    df_bdm = pd.DataFrame(bd_list)
 
-        st.subheader("BD VMAF", anchor="bd-vmaf")
-        st.plotly_chart(_create_bd_metrics_bar_chart(df_bdm, "bd_vmaf", "BD VMAF, the more, the better"), use_container_width=True)
+    bd_metrics_cols = ["bd_psnr", "bd_ssim", "bd_vmaf", "bd_vmaf_neg"]
+    bd_metrics_display = df_bdm[["source"] + bd_metrics_cols].rename(
+        columns={
+            "source": "Video",
+            "bd_psnr": "BD PSNR",
+            "bd_ssim": "BD SSIM",
+            "bd_vmaf": "BD VMAF",
+            "bd_vmaf_neg": "BD VMAF-NEG",
+        }
+    )
+    st.dataframe(
+        bd_metrics_display,
+        column_config=_number_columns({
+            "BD PSNR": "%+.4f",
+            "BD SSIM": "%+.4f",
+            "BD VMAF": "%+.2f",
+            "BD VMAF-NEG": "%+.2f",
+        }),
+        use_container_width=True,
+        hide_index=True,
+    )
 
-        st.subheader("BD VMAF-NEG", anchor="bd-vmaf-neg")
-        st.plotly_chart(_create_bd_metrics_bar_chart(df_bdm, "bd_vmaf_neg", "BD VMAF-NEG"), use_container_width=True)
-    else:
-        st.info("暂无 BD-Metrics 数据。")
+    if st.toggle("显示 BD-Metrics 柱状图", value=False, key="bd_metrics_show_charts"):
+        for col, subheader, anchor, title in _BD_METRICS_CHARTS:
+            st.subheader(subheader, anchor=anchor)
+            st.plotly_chart(
+                _create_bd_metrics_bar_chart(df_bdm[["source", col]], col, title),
+                use_container_width=True,
+            )
 
 
 def render_sidebar_contents_single() -> None:
@@ -528,9 +651,6 @@ def render_sidebar_contents_single() -> None:
 
 def render_single_information(info: dict) -> None:
     """渲染单列Information表格"""
-    import pandas as pd
-    from src.utils.streamlit_helpers import _format_encoder_type, _format_encoder_params, _format_points
-
     info_df = pd.DataFrame([
         {"项目": "编码器类型", "值": _format_encoder_type(info.get("encoder_type"))},
         {"项目": "编码参数", "值": _format_encoder_params(info.get("encoder_params"))},
@@ -541,9 +661,6 @@ def render_single_information(info: dict) -> None:
 
 def render_single_overall(df_metrics: "pd.DataFrame", df_perf: "pd.DataFrame") -> None:
     """渲染单侧Overall（无BD-Rate）"""
-    import pandas as pd
-    from src.utils.streamlit_helpers import _summary_stats, _render_overall_table
-
     if df_metrics.empty:
         st.info("暂无可用的指标数据。")
         return
@@ -605,8 +722,6 @@ def render_single_overall(df_metrics: "pd.DataFrame", df_perf: "pd.DataFrame") -
 
 def render_single_rd_curves(df: "pd.DataFrame") -> None:
     """渲染单条RD曲线"""
-    import plotly.graph_objects as go
-
     st.subheader("RD Curves", anchor="rd-curves")
     video_list = df["Video"].unique().tolist()
     metric_options = ["PSNR", "SSIM", "VMAF", "VMAF-NEG"]
@@ -642,9 +757,6 @@ def render_single_rd_curves(df: "pd.DataFrame") -> None:
 
 def render_single_performance(df_perf: "pd.DataFrame") -> None:
     """渲染单侧Performance"""
-    import plotly.graph_objects as go
-    from src.utils.streamlit_helpers import aggregate_cpu_samples, create_fps_chart
-
     st.header("Performance", anchor="performance")
 
     if df_perf is None or df_perf.empty:
@@ -653,43 +765,33 @@ def render_single_performance(df_perf: "pd.DataFrame") -> None:
 
     # CPU Usage
     st.subheader("CPU Usage", anchor="cpu-usage")
-    video_list_perf = df_perf["Video"].unique().tolist()
+    perf_index, points_by_video = _index_perf_rows(df_perf, ["Video", "Point"])
+    video_list_perf = list(points_by_video)
     if video_list_perf:
         col_sel_perf1, col_sel_perf2 = st.columns(2)
         with col_sel_perf1:
             selected_video_perf = st.selectbox("选择视频", video_list_perf, key="single_perf_video")
         with col_sel_perf2:
-            point_list_perf = df_perf[df_perf["Video"] == selected_video_perf]["Point"].unique().tolist()
+            point_list_perf = points_by_video[selected_video_perf]
             selected_point_perf = st.selectbox("选择码率点位", point_list_perf, key="single_perf_point")
 
         agg_interval = st.slider("聚合间隔 (ms)", min_value=100, max_value=1000, value=100, step=100, key="single_cpu_agg")
 
-        cpu_samples = []
-        for _, row in df_perf.iterrows():
-            if row["Video"] == selected_video_perf and row["Point"] == selected_point_perf:
-                cpu_samples = row.get("cpu_samples", []) or []
-                break
+        cpu_samples, sample_interval_ms = _cpu_samples_at(
+            df_perf, perf_index.get((selected_video_perf, selected_point_perf))
+        )
 
-        if cpu_samples:
-            cpu_x, cpu_y = aggregate_cpu_samples(cpu_samples, agg_interval)
+        if cpu_samples.size:
+            cpu_x, cpu_y = aggregate_cpu_samples(cpu_samples, agg_interval, sample_interval_ms)
             fig_cpu = go.Figure()
-            fig_cpu.add_trace(go.Scatter(
+            fig_cpu.add_trace(go.Scattergl(
                 x=cpu_x, y=cpu_y,
                 mode="lines",
                 name="CPU",
                 line=dict(color="#636efa", width=2),
             ))
-            if cpu_y:
-                max_idx = cpu_y.index(max(cpu_y))
-                fig_cpu.add_trace(go.Scatter(
-                    x=[cpu_x[max_idx]], y=[cpu_y[max_idx]],
-                    mode="markers+text",
-                    name="Max",
-                    marker=dict(color="#636efa", size=12, symbol="star"),
-                    text=[f"Max: {cpu_y[max_idx]:.1f}%"],
-                    textposition="top center",
-                    showlegend=False,
-                ))
+            if cpu_y.size:
+                fig_cpu.add_trace(_cpu_peak_trace(cpu_x, cpu_y, "#636efa", "Max"))
             fig_cpu.update_layout(
                 title=f"CPU占用率 - {selected_video_perf} ({selected_point_perf})",
                 xaxis_title="Time (s)",
@@ -698,15 +800,16 @@ def render_single_performance(df_perf: "pd.DataFrame") -> None:
             )
             st.plotly_chart(fig_cpu, use_container_width=True)
 
-            avg_cpu = sum(cpu_samples) / len(cpu_samples) if cpu_samples else 0
+            avg_cpu = _mean_cpu(cpu_samples)
             st.metric("Average CPU Usage", f"{avg_cpu:.2f}%")
         else:
             st.info("该视频/点位没有CPU采样数据。")
 
     # FPS
     st.subheader("FPS", anchor="fps")
-    df_sorted = df_perf.sort_values(by=["Video", "Point"])
-    df_sorted["x_label"] = df_sorted["Video"].astype(str) + "_" + df_sorted["Point"].astype(str)
+    # 只对绘图用到的列排序，不复制 cpu_samples 列
+    df_sorted = df_perf[["Video", "Point", "FPS"]].sort_values(by=["Video", "Point"])
+    df_sorted["x_label"] = video_point_labels(df_sorted)
 
     fig_fps = go.Figure()
     fig_fps.add_trace(go.Scatter(
@@ -729,14 +832,18 @@ def render_single_performance(df_perf: "pd.DataFrame") -> None:
     # Details
     st.subheader("Details", anchor="perf-details")
     with st.expander("查看详细性能数据", expanded=False):
-        df_detail = df_perf.drop(columns=["cpu_samples"], errors="ignore")
+        df_detail = df_perf[[c for c in df_perf.columns if c not in _CPU_SAMPLE_COLUMNS]]
         fmt = {
-            "Point": "{:.2f}",
-            "FPS": "{:.2f}",
-            "CPU Avg(%)": "{:.2f}",
-            "CPU Max(%)": "{:.2f}",
-            "Total Time(s)": "{:.2f}",
-            "Frames": "{:.0f}",
+            "Point": "%.2f",
+            "FPS": "%.2f",
+            "CPU Avg(%)": "%.2f",
+            "CPU Max(%)": "%.2f",
+            "Total Time(s)": "%.2f",
+            "Frames": "%.0f",
         }
-        styled_perf_detail = df_detail.sort_values(by=["Video", "Point"]).style.format(fmt, na_rep="-")
-        st.dataframe(styled_perf_detail, use_container_width=True, hide_index=True)
+        st.dataframe(
+            df_detail.sort_values(by=["Video", "Point"]),
+            column_config=_number_columns({col: spec for col, spec in fmt.items() if col in df_detail.columns}),
+            use_container_width=True,
+            hide_index=True,
+        )
@@ -3,48 +3,103 @@
 
 提供跨平台的系统环境信息采集功能，包括 CPU、内存、操作系统等信息。
 """
+import os
 import platform
+import re
 import subprocess
-from typing import Any, Dict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
 
 import psutil
 
+# 操作系统名在进程内不变，导入时取一次
+_SYSTEM = platform.system()
+
+# 字节 -> GB（内存字段单位）
+_GIB = 1 << 30
+
+# /proc/cpuinfo、/etc/os-release 字段：对整个文件内容做一次 C 层搜索，取首个匹配
+_CPUINFO_MODEL_RE = re.compile(rb"^model name[ \t]*:[ \t]*(.+)$", re.M)
+_CPUINFO_MHZ_RE = re.compile(rb"^cpu MHz[ \t]*:[ \t]*([0-9.]+)", re.M)
+_OS_RELEASE_PRETTY_NAME_RE = re.compile(rb"^PRETTY_NAME=(.*)$", re.M)
+
+
+def _run(cmd: List[str], timeout: float = 2) -> "subprocess.CompletedProcess[str]":
+    """执行探测命令：stdin 接 /dev/null（避免等待或继承终端输入），不继承多余的文件描述符"""
+    return subprocess.run(
+        cmd,
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+        text=True,
+        timeout=timeout,
+        close_fds=True,
+    )
+
+
+def _read_cpuinfo() -> bytes:
+    """一次 read() 以字节读入 /proc/cpuinfo，供下面的预编译正则整体搜索；读取失败时抛出 OSError"""
+    with open("/proc/cpuinfo", "rb") as f:
+        return f.read()
+
+
+def _darwin_sysctl_string(name: bytes) -> Optional[str]:
+    """通过 ctypes 调用 libc 的 sysctlbyname 读取字符串型 sysctl（免去 fork sysctl 进程），失败返回 None"""
+    try:
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c"))
+        size = ctypes.c_size_t(0)
+        if libc.sysctlbyname(name, None, ctypes.byref(size), None, ctypes.c_size_t(0)) != 0 or not size.value:
+            return None
+        buf = ctypes.create_string_buffer(size.value)
+        if libc.sysctlbyname(name, buf, ctypes.byref(size), None, ctypes.c_size_t(0)) != 0:
+            return None
+        return buf.value.decode("utf-8", errors="replace").strip() or None
+    except Exception:
+        return None
+
 
 def get_cpu_brand() -> str:
     """跨平台获取 CPU 品牌/型号名称"""
-    # macOS: 使用 sysctl
-    if platform.system() == "Darwin":
+    # macOS: 通过 libc sysctlbyname 读取，失败时回退到 sysctl 命令
+    if _SYSTEM == "Darwin":
+        brand = _darwin_sysctl_string(b"machdep.cpu.brand_string")
+        if brand:
+            return brand
         try:
-            result = subprocess.run(
-                ["sysctl", "-n", "machdep.cpu.brand_string"],
-                capture_output=True,
-                text=True,
-                timeout=5,
-            )
+            result = _run(["sysctl", "-n", "machdep.cpu.brand_string"], timeout=5)
             if result.returncode == 0 and result.stdout.strip():
                 return result.stdout.strip()
         except Exception:
             pass
 
     # Linux: 读取 /proc/cpuinfo
-    if platform.system() == "Linux":
+    if _SYSTEM == "Linux":
         try:
-            with open("/proc/cpuinfo", "r") as f:
-                for line in f:
-                    if line.startswith("model name"):
-                        return line.split(":")[1].strip()
+            m = _CPUINFO_MODEL_RE.search(_read_cpuinfo())
+            if m and m.group(1).strip():
+                return m.group(1).decode("utf-8", errors="replace").strip()
         except Exception:
             pass
 
-    # Windows: 使用 wmic 或注册表
-    if platform.system() == "Windows":
+    # Windows: 优先读注册表（无需启动 WMI），失败时回退到 wmic
+    if _SYSTEM == "Windows":
         try:
-            result = subprocess.run(
-                ["wmic", "cpu", "get", "name"],
-                capture_output=True,
-                text=True,
-                timeout=5,
-            )
+            import winreg
+
+            with winreg.OpenKey(
+                winreg.HKEY_LOCAL_MACHINE, r"HARDWARE\DESCRIPTION\System\CentralProcessor\0"
+            ) as key:
+                name, _ = winreg.QueryValueEx(key, "ProcessorNameString")
+            if isinstance(name, str) and name.strip():
+                return name.strip()
+        except Exception:
+            pass
+        try:
+            result = _run(["wmic", "cpu", "get", "name"], timeout=5)
             if result.returncode == 0:
                 lines = [l.strip() for l in result.stdout.strip().split("\n") if l.strip() and l.strip() != "Name"]
                 if lines:
@@ -56,101 +111,155 @@ def get_cpu_brand() -> str:
     return platform.processor() or "Unknown"
 
 
-def get_env_info() -> Dict[str, Any]:
+def _linux_cpu_mhz() -> Optional[float]:
+    """读取 /proc/cpuinfo 中第一个 "cpu MHz" 字段，不存在或读取失败时返回 None"""
+    try:
+        m = _CPUINFO_MHZ_RE.search(_read_cpuinfo())
+        return float(m.group(1)) if m else None
+    except (OSError, ValueError):
+        return None
+
+
+def _get_numa_nodes() -> Optional[int]:
+    """统计 NUMA 节点数：直接枚举 /sys/devices/system/node/node*，sysfs 不可用时才调用 lscpu"""
+    try:
+        with os.scandir("/sys/devices/system/node") as entries:
+            count = sum(1 for e in entries if e.name.startswith("node") and e.name[4:].isdigit())
+        if count:
+            return count
+    except OSError:
+        pass
+
+    try:
+        result = _run(["lscpu"], timeout=2)
+        if result.returncode == 0:
+            for line in result.stdout.split("\n"):
+                if line.startswith("NUMA node(s):"):
+                    return int(line.split(":")[1].strip())
+    except Exception:
+        pass
+    return None
+
+
+def _get_linux_distro() -> Optional[str]:
+    """读取 Linux 发行版名称：优先解析 /etc/os-release，缺失时才调用 lsb_release（其本身是 Python 脚本，启动较慢）"""
+    try:
+        with open("/etc/os-release", "rb") as f:
+            m = _OS_RELEASE_PRETTY_NAME_RE.search(f.read())
+        if m:
+            return m.group(1).decode("utf-8", errors="replace").strip().strip('"')
+    except Exception:
+        pass
+
+    try:
+        result = _run(["lsb_release", "-d"], timeout=2)
+        if result.returncode == 0:
+            return result.stdout.split(":", 1)[1].strip() if ":" in result.stdout else result.stdout.strip()
+    except Exception:
+        pass
+    return None
+
+
+@lru_cache(maxsize=1)
+def _get_static_env_info() -> Dict[str, Any]:
     """
-    获取系统环境信息
+    采集进程生命周期内不会变化的环境信息（操作系统、CPU 型号/核数、NUMA、发行版、主机名）
 
-    Returns:
-        包含以下字段的字典：
-        - execution_time: 执行时间
-        - os, os_version, os_full: 操作系统信息
-        - cpu_arch, cpu_model: CPU 架构和型号
-        - cpu_phys_cores, cpu_log_cores: 物理核心数和逻辑核心数
-        - cpu_percent_before: CPU 占用率
-        - cpu_freq_mhz: CPU 主频（MHz）
-        - numa_nodes: NUMA 节点数（仅 Linux）
-        - mem_total_gb, mem_used_gb, mem_available_gb: 内存信息（GB）
-        - mem_percent_used: 内存使用率
-        - linux_distro: Linux 发行版（仅 Linux）
-        - hostname: 主机名
+    结果按进程缓存：其中的 /proc、/sys 与 /etc 文件读取等只在首次调用时执行一次。
+    调用方不要修改返回的字典，get_env_info() 会将其复制到新字典中。
     """
     info: Dict[str, Any] = {}
+    is_linux = _SYSTEM == "Linux"
+    try:
+        # CPU 型号、NUMA、发行版三个探测相互独立，且回退路径可能启动子进程，并发执行；
+        # 其余字段在主线程中同时采集
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            brand_future = executor.submit(get_cpu_brand)
+            numa_future = executor.submit(_get_numa_nodes) if is_linux else None
+            distro_future = executor.submit(_get_linux_distro) if is_linux else None
+
+            # 操作系统
+            info["os"] = _SYSTEM
+            info["os_version"] = platform.release()
+            info["os_full"] = platform.platform()
+
+            # CPU 信息
+            info["cpu_arch"] = platform.machine()  # x86_64, arm64, aarch64 等
+            info["cpu_model"] = brand_future.result()   # Apple M2, Intel Xeon 等
+            info["cpu_phys_cores"] = psutil.cpu_count(logical=False) or 0
+            info["cpu_log_cores"] = psutil.cpu_count(logical=True) or 0
+
+            # NUMA nodes
+            if numa_future is not None:
+                numa_nodes = numa_future.result()
+                if numa_nodes is not None:
+                    info["numa_nodes"] = numa_nodes
+
+            # Linux 发行版信息
+            if distro_future is not None:
+                distro = distro_future.result()
+                if distro:
+                    info["linux_distro"] = distro
+
+        # 主机名
+        info["hostname"] = platform.node()
+
+    except Exception:
+        pass
+    return info
+
+
+def _get_dynamic_env_info() -> Dict[str, Any]:
+    """采集每次调用都需要重新采样的信息（执行时间、CPU 占用率/主频、内存使用）"""
+    info: Dict[str, Any] = {}
     try:
         # 执行时间
-        from datetime import datetime
         info["execution_time"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-        # 操作系统
-        info["os"] = platform.system()
-        info["os_version"] = platform.release()
-        info["os_full"] = platform.platform()
-
-        # CPU 信息
-        info["cpu_arch"] = platform.machine()  # x86_64, arm64, aarch64 等
-        info["cpu_model"] = get_cpu_brand()   # Apple M2, Intel Xeon 等
-        info["cpu_phys_cores"] = psutil.cpu_count(logical=False) or 0
-        info["cpu_log_cores"] = psutil.cpu_count(logical=True) or 0
         info["cpu_percent_before"] = round(psutil.cpu_percent(interval=0.1), 1)
 
-        # CPU 主频（MHz）
-        try:
-            cpu_freq = psutil.cpu_freq()
-            if cpu_freq:
-                info["cpu_freq_mhz"] = round(cpu_freq.current, 2)
-        except Exception:
-            pass
-
-        # NUMA nodes
+        # CPU 主频（MHz）：Linux 上 psutil.cpu_freq() 会逐核读取 scaling_cur_freq，核数多时可达秒级，
+        # 优先取 /proc/cpuinfo 中的 "cpu MHz"（ARM 等没有该字段时再回退到 psutil）
         try:
-            if platform.system() == "Linux":
-                result = subprocess.run(
-                    ["lscpu"],
-                    capture_output=True,
-                    text=True,
-                    timeout=2,
-                )
-                if result.returncode == 0:
-                    for line in result.stdout.split("\n"):
-                        if line.startswith("NUMA node(s):"):
-                            info["numa_nodes"] = int(line.split(":")[1].strip())
-                            break
+            cpu_mhz = _linux_cpu_mhz() if _SYSTEM == "Linux" else None
+            if cpu_mhz is None:
+                cpu_freq = psutil.cpu_freq()
+                cpu_mhz = cpu_freq.current if cpu_freq else None
+            if cpu_mhz:
+                info["cpu_freq_mhz"] = round(cpu_mhz, 2)
         except Exception:
             pass
 
-        # 内存信息（转换为 GB）
+        # 内存信息（转换为 GB）：四个字段取自同一次 virtual_memory()（Linux 上即一次 /proc/meminfo 读取）
         vm = psutil.virtual_memory()
-        info["mem_total_gb"] = round(vm.total / (1024 ** 3), 2)
-        info["mem_used_gb"] = round(vm.used / (1024 ** 3), 2)
-        info["mem_available_gb"] = round(vm.available / (1024 ** 3), 2)
+        info["mem_total_gb"] = round(vm.total / _GIB, 2)
+        info["mem_used_gb"] = round(vm.used / _GIB, 2)
+        info["mem_available_gb"] = round(vm.available / _GIB, 2)
         info["mem_percent_used"] = round(vm.percent, 1)
 
-        # Linux 发行版信息
-        if platform.system() == "Linux":
-            try:
-                result = subprocess.run(
-                    ["lsb_release", "-d"],
-                    capture_output=True,
-                    text=True,
-                    timeout=2,
-                )
-                if result.returncode == 0:
-                    info["linux_distro"] = result.stdout.split(":", 1)[1].strip() if ":" in result.stdout else result.stdout.strip()
-                else:
-                    # 尝试读取 /etc/os-release
-                    try:
-                        with open("/etc/os-release", "r") as f:
-                            for line in f:
-                                if line.startswith("PRETTY_NAME="):
-                                    info["linux_distro"] = line.split("=", 1)[1].strip().strip('"')
-                                    break
-                    except Exception:
-                        pass
-            except Exception:
-                pass
-
-        # 主机名
-        info["hostname"] = platform.node()
-
     except Exception:
         pass
     return info
+
+
+def get_env_info() -> Dict[str, Any]:
+    """
+    获取系统环境信息
+
+    静态部分（操作系统、CPU 型号等）每个进程只采集一次，动态部分每次调用重新采样。
+
+    Returns:
+        包含以下字段的字典：
+        - execution_time: 执行时间
+        - os, os_version, os_full: 操作系统信息
+        - cpu_arch, cpu_model: CPU 架构和型号
+        - cpu_phys_cores, cpu_log_cores: 物理核心数和逻辑核心数
+        - cpu_percent_before: CPU 占用率
+        - cpu_freq_mhz: CPU 主频（MHz）
+        - numa_nodes: NUMA 节点数（仅 Linux）
+        - mem_total_gb, mem_used_gb, mem_available_gb: 内存信息（GB）
+        - mem_percent_used: 内存使用率
+        - linux_distro: Linux 发行版（仅 Linux）
+        - hostname: 主机名
+    """
+    return {**_get_static_env_info(), **_get_dynamic_env_info()}
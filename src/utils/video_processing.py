@@ -4,6 +4,7 @@
 提供分辨率计算、滤镜构建等公共函数，供编码和打分阶段使用。
 """
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import Optional, Tuple
 
 
@@ -17,6 +18,33 @@ class VideoProcessingConfig:
     scale_algorithm: str = "bicubic"  # 缩放算法
 
 
+# 帧率相同判定的容差（千分之一帧/秒为单位，差值需严格小于它）：NTSC 系列有理帧率的十进制写法与 N/1001 真值只差 ~3e-5
+# （如 23.976 vs 24000/1001），而真正不同的常见帧率（24 vs 23.976、30 vs 29.97）至少相差 0.024
+_FPS_TOLERANCE_MILLI = 10
+
+
+def _same_fps(a: float, b: float) -> bool:
+    """
+    判断两个帧率是否视为相同（同一有理帧率的不同写法不触发 fps 滤镜）
+
+    先四舍五入到整数毫帧再比较，结果不受浮点误差影响（直接截断会把 23.976 算成 23975）。
+    """
+    return abs(round(a * 1000) - round(b * 1000)) < _FPS_TOLERANCE_MILLI
+
+
+def _format_fps(fps: float) -> str:
+    """
+    帧率写入滤镜参数的格式：N/1001 有理帧率写成分数，其余按 6 位有效数字
+
+    避免 repr 输出 29.970000000000002 之类的长尾，同时不丢失 24000/1001 这类帧率的精度。
+    """
+    numerator = round(fps * 1001)
+    if numerator % 1000 == 0 and abs(fps - numerator / 1001) < 1e-6 and not float(fps).is_integer():
+        return f"{numerator}/1001"
+    return f"{fps:.6g}"
+
+
+@lru_cache(maxsize=256)
 def calculate_target_resolution(
     src_width: int,
     src_height: int,
@@ -25,6 +53,8 @@ def calculate_target_resolution(
     """
     根据最短边计算目标分辨率（保持宽高比）
 
+    纯函数，按参数缓存：批量任务中同一分辨率的视频只计算一次。
+
     Args:
         src_width: 源视频宽度
         src_height: 源视频高度
@@ -39,16 +69,14 @@ def calculate_target_resolution(
     # 确定短边
     shortest_len = min(src_width, src_height)
 
-    # 计算缩放比例
-    scale_ratio = shortest_size / shortest_len
-
-    # 计算目标分辨率（确保为偶数）
-    target_width = int((src_width * scale_ratio) / 2) * 2
-    target_height = int((src_height * scale_ratio) / 2) * 2
+    # 计算目标分辨率（纯整数运算：先乘后整除，再清掉最低位向下取偶，避免浮点误差少算 1 像素）
+    target_width = (src_width * shortest_size // shortest_len) & ~1
+    target_height = (src_height * shortest_size // shortest_len) & ~1
 
     return target_width, target_height
 
 
+@lru_cache(maxsize=256)
 def build_vf_filter(
     src_width: int,
     src_height: int,
@@ -61,6 +89,8 @@ def build_vf_filter(
     """
     构建 -vf 滤镜字符串
 
+    纯函数，按参数缓存（参数均为可哈希的 int/float/str）。
+
     Args:
         src_width: 源视频宽度
         src_height: 源视频高度
@@ -76,9 +106,9 @@ def build_vf_filter(
     """
     filters = []
 
-    # 帧率转换
-    if target_fps and abs(target_fps - src_fps) > 0.01:
-        filters.append(f"fps={target_fps}")
+    # 帧率转换（与源帧率视为相同时不插入 fps 滤镜，避免 FFmpeg 额外做一次帧率重采样）
+    if target_fps and not _same_fps(target_fps, src_fps):
+        filters.append(f"fps={_format_fps(target_fps)}")
 
     # 分辨率转换
     out_width = target_width if target_width else src_width
@@ -175,6 +205,15 @@ def build_scoring_vf_filter(
     # 打分帧率：优先使用模板的 target_fps，否则使用编码后帧率
     score_fps = target_fps if target_fps else enc_fps
 
+    # 码流与源的分辨率、帧率一致且无需转换帧率时，两侧都不需要滤镜
+    if (
+        enc_width == src_width
+        and enc_height == src_height
+        and _same_fps(enc_fps, src_fps)
+        and _same_fps(score_fps, src_fps)
+    ):
+        return None, None, src_width, src_height, score_fps
+
     if upscale_to_source:
         # 码流上采样到源分辨率
         score_width = src_width
@@ -0,0 +1,21 @@
+"""编码性能数据回归测试"""
+from src.utils.performance import _MAX_CPU_SAMPLES, _SLOW_SAMPLE_RATIO, PerformanceData
+
+
+def test_cpu_samples_stay_uniform_after_decimation():
+    # 模拟 sample_cpu：前 5 秒每 100ms 采样，之后每 500ms 采样，共 2 小时
+    perf = PerformanceData()
+    perf.cpu_sample_interval_ms = 100
+    for _ in range(50):
+        perf.add_sample(10.0, 100)
+    perf.decimate(_SLOW_SAMPLE_RATIO)
+    wall_ms = 5000
+    for i in range(14390):
+        perf.add_sample(float(i % 100), 500)
+        wall_ms += 500
+
+    assert len(perf.cpu_samples) < _MAX_CPU_SAMPLES
+    assert perf.cpu_sample_interval_ms > 500
+    covered_ms = len(perf.cpu_samples) * perf.cpu_sample_interval_ms
+    assert abs(covered_ms - wall_ms) <= perf.cpu_sample_interval_ms
+    assert perf._cpu_count == 50 + 14390
@@ -0,0 +1,30 @@
+"""Schedule 存储回归测试"""
+from datetime import datetime
+
+from src.models.schedule import ScheduleExecution
+from src.services.schedule_storage import ScheduleStorage
+
+
+def _make_execution(execution_id: str) -> ScheduleExecution:
+    return ScheduleExecution(
+        execution_id=execution_id,
+        schedule_id="s1",
+        executed_at=datetime.utcnow(),
+        job_id=f"job-{execution_id}",
+        build_status="success",
+    )
+
+
+def test_add_execution_after_torn_line(tmp_path):
+    storage = ScheduleStorage()
+    storage.root_dir = tmp_path
+    (tmp_path / "s1").mkdir()
+
+    storage.add_execution("s1", _make_execution("e1"))
+    # 模拟上次追加被中断：末尾残留半行且无换行
+    with open(storage._get_executions_path("s1"), "ab") as f:
+        f.write(b'{"execution_id": "e2", "sched')
+    storage.add_execution("s1", _make_execution("e3"))
+
+    executions = storage.list_executions("s1")
+    assert [e.execution_id for e in executions] == ["e3", "e1"]
@@ -0,0 +1,55 @@
+"""调度器回归测试"""
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from src.models.schedule import EncoderConfig, ScheduleMetadata, ScheduleRepeat
+from src.services import scheduler as scheduler_module
+from src.services.scheduler import SchedulerService
+
+
+def _make_schedule(start_time: datetime) -> ScheduleMetadata:
+    return ScheduleMetadata(
+        schedule_id="s1",
+        name="once",
+        encoder_type="ffmpeg",
+        encoder_config=EncoderConfig(repo="r", branch="b", build_script="s", binary_path="p"),
+        template_id="t1",
+        template_type="metrics_analysis",
+        template_name="t",
+        start_time=start_time,
+        repeat=ScheduleRepeat.NONE,
+    )
+
+
+def test_one_off_schedule_fires_once(monkeypatch):
+    schedule = _make_schedule(datetime.utcnow() - timedelta(seconds=1))
+    calls = []
+
+    async def fake_execute(s):
+        # 与执行器一致：记录执行时间，单次任务不再有下次执行时间
+        calls.append(s.schedule_id)
+        s.last_execution = datetime.utcnow()
+        s.next_execution = None
+        return SimpleNamespace(job_id="j1", build_status="success")
+
+    monkeypatch.setattr(scheduler_module.schedule_runner, "execute", fake_execute)
+    monkeypatch.setattr(scheduler_module.schedule_storage, "get_schedule", lambda _id: schedule)
+    monkeypatch.setattr(scheduler_module.schedule_storage, "list_active", lambda: [])
+
+    async def run():
+        service = SchedulerService()
+        await service.start()
+        service.add_schedule(schedule)
+        await asyncio.sleep(0.3)
+        await service.shutdown()
+        return service
+
+    service = asyncio.run(run())
+
+    assert calls == ["s1"]
+    assert service.get_next_run_time("s1") is None
+
+    # 已执行过的单次任务重新登记时不应再入堆
+    service.add_schedule(schedule)
+    assert "s1" not in service._entries